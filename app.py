@@ -1,15 +1,38 @@
 from flask import Flask, render_template, request, jsonify
 import pandas as pd
 import numpy as np
-import requests
 import joblib
+import hmac
+import io
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
 from sklearn.linear_model import LinearRegression
 import plotly.graph_objects as go
 import plotly.utils
-from forecast_model import generate_forecasts
+from forecast_model import generate_forecasts, get_forecaster
 from binary_crop_logic import get_binary_crop_recommendation, get_npk_status
+from sensor_store import SensorStore
+from reading_db import DEFAULT_DEVICE, ReadingDB
+from sensor_frame import SensorFrame
+from ring_buffer import SensorRingBuffers
+from sensor_schema import (READING_SCHEMA, SENSOR_COLUMNS, iter_csv_frames, parse_batch, parse_timestamps,
+                           records_to_frame, validate_frame)
+from ingestion import IngestionWorker
+from firebase_sync import FirebaseCursorSync, FirebaseStreamListener
+from upstream_client import ConditionalResource, upstream
+from single_flight import SingleFlight
+from stale_cache import StaleWhileRevalidateCache
+from sheet_tail import SheetTailReader
+from source_health import SourceSelector
+from weather_cache import WeatherCache
+from crop_engine import CROP_PARAMETERS, CropEngine
+from crop_classifier import CropClassifier
+from geocode_cache import GeocodeCache
 
 app = Flask(__name__)
 
@@ -18,6 +41,44 @@ FIREBASE_URL = "https://hapagfarm-default-rtdb.asia-southeast1.firebasedatabase.
 FIREBASE_NODE = "/sensor_logs.json"
 GOOGLE_SHEET_ID = "1rtSbAKs5XvVjVoWYVFIbIIrYW_JF3wcqNFXDnZX1XYg"
 GOOGLE_SHEET_URL = f"https://docs.google.com/spreadsheets/d/{GOOGLE_SHEET_ID}/export?format=csv"
+WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+GEOCODE_URL = "https://nominatim.openstreetmap.org/reverse"
+DEFAULT_LOCATION = (14.1953, 120.8769)
+# Weather is cached per grid cell of this many degrees (0.01 is about 1 km)
+WEATHER_GRID = float(os.environ.get('WEATHER_GRID', 0.01))
+# Seconds before the top of the hour at which cached weather is refreshed in the background
+WEATHER_REFRESH_AHEAD = float(os.environ.get('WEATHER_REFRESH_AHEAD', 300))
+SENSOR_STORE_DIR = os.environ.get('SENSOR_STORE_DIR', 'sensor_store')
+# SQLite (WAL) database queried by analytics and forecasting; shared by all workers
+READINGS_DB = os.environ.get('READINGS_DB', os.path.join(SENSOR_STORE_DIR, 'readings.db'))
+# Most recent readings kept in memory per sensor for the forecaster and /api/recent
+RECENT_CAPACITY = int(os.environ.get('RECENT_CAPACITY', 200))
+# Upper bound on points per chart; longer windows are drawn from minute/hour/day rollups
+CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 1000))
+# Bearer token devices must send to POST /api/readings. Without one the endpoint
+# refuses every upload, unless INGEST_OPEN=1 explicitly allows unauthenticated uploads
+INGEST_TOKEN = os.environ.get('INGEST_TOKEN') or None
+INGEST_OPEN = os.environ.get('INGEST_OPEN', '0') == '1'
+# Largest request body accepted (bytes); larger uploads are answered with 413
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 16 * 2**20))
+# Reverse-geocoded place names, shared by all workers (coordinates rounded to GEOCODE_PRECISION decimals)
+GEOCODE_DB = os.environ.get('GEOCODE_DB', os.path.join(SENSOR_STORE_DIR, 'geocode.db'))
+GEOCODE_PRECISION = int(os.environ.get('GEOCODE_PRECISION', 3))
+# Longest a weather fetch waits for the location name (seconds)
+GEOCODE_TIMEOUT = float(os.environ.get('GEOCODE_TIMEOUT', 10))
+STORE_SYNC_INTERVAL = float(os.environ.get('STORE_SYNC_INTERVAL', 60))
+# Rows parsed per chunk when streaming the Sheet export into the store
+SHEET_CHUNK_ROWS = int(os.environ.get('SHEET_CHUNK_ROWS', 20000))
+INGEST_ENABLED = os.environ.get('INGEST_ENABLED', '1') == '1'
+INGEST_INTERVAL = float(os.environ.get('INGEST_INTERVAL', 5))
+# 'poll' re-reads Sheets/Firebase every INGEST_INTERVAL, 'stream' listens to Firebase push events
+INGEST_MODE = os.environ.get('INGEST_MODE', 'poll')
+# Oldest cached reading still served when upstream is failing (seconds)
+MAX_STALE = float(os.environ.get('MAX_STALE', 300))
+# Overall time the dashboard waits on its data sources before using cached values (seconds)
+DASHBOARD_BUDGET = float(os.environ.get('DASHBOARD_BUDGET', 2.0))
+
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 SOIL_THRESHOLDS = {
     "N": {"critical_low": 20, "optimal_min": 88.9, "optimal_max": 177.8, "critical_high": 240},
@@ -81,45 +142,38 @@ def load_ml_models():
         return None, None, False
 
 ml_model, label_encoder, model_loaded = load_ml_models()
+crop_classifier = CropClassifier(ml_model, label_encoder, ML_TO_FILIPINO) if model_loaded else None
 
-# Helper Functions
-def validate_input(value, min_val=0, max_val=1000):
-    try:
-        num_value = float(value)
-        return min_val <= num_value <= max_val
-    except:
-        return False
+# Thread pools for concurrent upstream calls and dashboard data sources
+upstream_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='upstream')
+dashboard_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='dashboard')
+
+# Upstream (connect, read) timeouts per host
+upstream.configure_host('docs.google.com', connect=5, read=20)
+upstream.configure_host(FIREBASE_URL.split('://')[1], connect=5, read=10)
+upstream.configure_host('api.open-meteo.com', connect=5, read=10)
+upstream.configure_host('nominatim.openstreetmap.org', connect=3, read=5)
 
+# Local sensor history
+reading_db = ReadingDB(READINGS_DB)
+# Newest Sheet timestamp (ns) already stored; older Sheet chunks are not parsed again
+SHEET_CURSOR = 'sheet_cursor'
+# Columnar history written by earlier versions, imported once into the reading DB
+sensor_store = SensorStore(SENSOR_STORE_DIR)
+if len(sensor_store):
+    if not len(reading_db):
+        reading_db.insert_frame(sensor_store.frame())
+    if reading_db.meta(SHEET_CURSOR) is None:
+        reading_db.set_meta(SHEET_CURSOR, sensor_store.last_timestamp())
+_last_store_sync = 0.0
+firebase_sync = FirebaseCursorSync(FIREBASE_URL, FIREBASE_NODE,
+                                   cursor_path=os.path.join(SENSOR_STORE_DIR, 'firebase_cursor.json'))
+
+# Helper Functions
 def safe_ml_prediction(n, p, k, ph, hum):
-    if not ml_model or not label_encoder:
-        return None, 0
-    
-    try:
-        if not all(validate_input(x) for x in [n, p, k]) or not validate_input(ph, 0, 14) or not validate_input(hum, 0, 100):
-            return None, 0
-            
-        input_df = pd.DataFrame([[n, p, k, ph, hum]], columns=['N', 'P', 'K', 'Soil_pH', 'Humidity'])
-        prediction_idx = ml_model.predict(input_df)[0]
-        
-        available_classes = label_encoder.classes_
-        
-        if 0 <= prediction_idx < len(available_classes):
-            ml_prediction = available_classes[prediction_idx]
-            filipino_crop = ML_TO_FILIPINO.get(ml_prediction.lower(), ml_prediction.title())
-            
-            confidence = 85.0
-            if hasattr(ml_model, "predict_proba"):
-                try:
-                    confidence = np.max(ml_model.predict_proba(input_df)) * 100
-                except:
-                    confidence = 85.0
-            
-            return filipino_crop, confidence
-        else:
-            return None, 0
-            
-    except Exception as e:
+    if crop_classifier is None:
         return None, 0
+    return crop_classifier.predict(n, p, k, ph, hum)
 
 def calculate_soil_health_score(n, p, k, ph, hum):
     def get_score(value, param_type):
@@ -137,120 +191,410 @@ def calculate_soil_health_score(n, p, k, ph, hum):
               get_score(ph, "pH"), get_score(hum, "humidity")]
     return sum(scores) / len(scores)
 
+# CROP_DATABASE compiled into min/max matrices, scored for many readings at once
+crop_engine = CropEngine(CROP_DATABASE)
+
 def get_expert_recommendation(n, p, k, ph, hum):
-    crop_scores = {}
-    for crop, requirements in CROP_DATABASE.items():
-        score = 0
-        for param, (min_val, max_val) in requirements.items():
-            if param == "pH":
-                value = ph
-            elif param == "humidity":
-                value = hum
-            else:
-                value = locals()[param.lower()]
-            
-            if min_val <= value <= max_val:
-                score += 2
-            elif abs(value - min_val) <= 20 or abs(value - max_val) <= 20:
-                score += 1
-        
-        crop_scores[crop] = (score / 10) * 100
-    
-    if crop_scores:
-        best_crop = max(crop_scores, key=crop_scores.get)
-        if crop_scores[best_crop] >= 40:
-            return best_crop
-    return "Rice"
+    names, _, _ = crop_engine.recommend([[n, p, k, ph, hum]])
+    return str(names[0])
 
-def fetch_latest_data():
-    # Try Google Sheets first (more reliable)
+# Latency / error tracking and circuit breaking for Sheets and Firebase
+source_selector = SourceSelector(['sheets', 'firebase'],
+                                 failure_threshold=int(os.environ.get('CIRCUIT_FAILURES', 3)),
+                                 cooldown=float(os.environ.get('CIRCUIT_COOLDOWN', 30)))
+
+# Sheet export, re-parsed only when its content changes
+sheet_source = ConditionalResource(GOOGLE_SHEET_URL)
+# Concurrent callers share one in-flight upstream fetch
+upstream_flight = SingleFlight()
+
+# Latest sheet row without downloading the whole history
+sheet_tail = SheetTailReader(GOOGLE_SHEET_ID)
+
+def parse_sheet_latest(content):
+    df = pd.read_csv(io.BytesIO(content))
+    if df.empty:
+        return None
+    # Get the last row
+    return map_sheet_row(df.iloc[-1])
+
+def map_sheet_row(last_row):
+    return READING_SCHEMA.reading(last_row)
+
+# History export, streamed into the store chunk by chunk
+sheet_history_source = ConditionalResource(GOOGLE_SHEET_URL)
+
+def reading_key(frame):
+    """Columns identifying one reading: its device (when the frame names one) and timestamp"""
+    return ['device_id', 'timestamp'] if 'device_id' in frame.columns else ['timestamp']
+
+def store_frame(frame):
+    """
+    Write a normalized frame's readings to the reading DB in one transaction.
+    Rows are keyed by (device_id, timestamp) and replace an existing reading
+    with the same key, so readings of every device and late readings with
+    older timestamps are kept, and a batch that failed part way can simply
+    be stored again. Returns the number of rows written.
+    """
+    if frame is None or frame.empty:
+        return 0
+    frame = frame.drop_duplicates(reading_key(frame), keep='last')
+    return reading_db.insert_frame(frame)
+
+@upstream_flight.coalesce('sheet_history')
+def ingest_sheet_history():
+    """
+    Stream the Sheet export into the reading DB in SHEET_CHUNK_ROWS chunks,
+    so peak memory does not depend on the length of the history. An export
+    with the same content hash as the last ingested one is not parsed, nor
+    are chunks no newer than the last Sheet row stored (SHEET_CURSOR).
+    Returns the number of rows written.
+    """
+    download = sheet_history_source.open()
+    if download is None:
+        # Not modified, or the same content as the last ingested export
+        return 0
+    with download.body:
+        cursor = reading_db.meta(SHEET_CURSOR)
+        after = np.datetime64(cursor, 'ns') if cursor is not None else None
+        written = 0
+        newest = None
+        for frame in iter_csv_frames(download.body, SHEET_CHUNK_ROWS, after=after):
+            written += store_frame(frame)
+            if not frame.empty:
+                last = frame['timestamp'].max()
+                newest = last if newest is None or last > newest else newest
+    if newest is not None and not pd.isna(newest):
+        reading_db.set_meta(SHEET_CURSOR, newest.value)
+    sheet_history_source.commit(download)
+    return written
+
+def latest_from_sheets():
+    # Try the sheet tail first: cost does not grow with the sheet's length
     try:
-        df = pd.read_csv(GOOGLE_SHEET_URL)
-        if not df.empty:
-            # Get the last row
-            last_row = df.iloc[-1]
-            
-            mapped_values = {
-                'N': float(last_row.get('N (ppm)', last_row.get('N', 0))),
-                'P': float(last_row.get('P (ppm)', last_row.get('P', 0))),
-                'K': float(last_row.get('K (ppm)', last_row.get('K', 0))),
-                'ph': float(last_row.get('pH', last_row.get('ph', 0))),
-                'humidity': float(last_row.get('Humidity', last_row.get('humidity', 0))),
-                'ec': float(last_row.get('EC', 0)),  # Electrical Conductivity
-                'temperature': float(last_row.get('Temp', last_row.get('Temperature', 0))),
-                'timestamp': str(last_row.get('Timestamp', last_row.get('timestamp', 'Unknown')))
-            }
+        last_row = sheet_tail.latest_row()
+        if last_row is not None:
+            mapped_values = map_sheet_row(last_row)
             return mapped_values, mapped_values['timestamp']
     except Exception as e:
-        print(f"Google Sheets error: {e}")
+        print(f"Google Sheets tail error: {e}")
     
-    # Fallback to Firebase
+    # Full export (more reliable)
+    try:
+        upstream_flight.do('sheet', sheet_source.fetch)
+        mapped_values = sheet_source.parsed('latest', parse_sheet_latest)
+        if mapped_values:
+            return mapped_values, mapped_values['timestamp']
+    except Exception as e:
+        print(f"Google Sheets error: {e}")
+    return None
+
+def latest_from_firebase():
     try:
         url = f"{FIREBASE_URL}{FIREBASE_NODE}?orderBy=\"$key\"&limitToLast=1"
-        response = requests.get(url, timeout=5)
+        response = upstream.get(url)
         if response.status_code == 200:
             data = response.json()
             if data:
                 key = list(data.keys())[0]
-                values = data[key]
-                timestamp = values.get('timestamp', values.get('date', 'Unknown'))
-                
-                mapped_values = {
-                    'N': values.get('N', values.get('nitrogen', 0)),
-                    'P': values.get('P', values.get('phosphorus', 0)),
-                    'K': values.get('K', values.get('potassium', 0)),
-                    'ph': values.get('ph', values.get('pH', 0)),
-                    'humidity': values.get('humidity', 0),
-                    'soil_moisture': values.get('soil_moisture', 0),
-                    'temperature': values.get('temperature', 0),
-                    'timestamp': timestamp
-                }
-                return mapped_values, timestamp
-    except:
-        pass
+                mapped_values = READING_SCHEMA.reading(data[key])
+                return mapped_values, mapped_values['timestamp']
+    except Exception as e:
+        print(f"Firebase error: {e}")
+    return None
+
+LATEST_SOURCES = {'sheets': latest_from_sheets, 'firebase': latest_from_firebase}
+
+@upstream_flight.coalesce('latest')
+def fetch_latest_data():
+    """Latest reading from the fastest healthy source, skipping sources whose circuit is open"""
+    for name in source_selector.order():
+        if not source_selector.allow(name):
+            continue
+        try:
+            result = source_selector.call(name, LATEST_SOURCES[name])
+        except Exception as e:
+            print(f"{name} source error: {e}")
+            continue
+        if result:
+            return result
     return None, None
 
+@upstream_flight.coalesce('history')
 def fetch_firebase_data():
-    # Try Google Sheets first for historical data
+    """
+    Firebase entries added since the last synced key, as (normalized frame,
+    new cursor); commit the cursor with firebase_sync.advance once stored
+    """
     try:
-        df = pd.read_csv(GOOGLE_SHEET_URL)
-        if not df.empty:
-            # Convert to Firebase-like format
-            data = {}
-            for idx, row in df.iterrows():
-                timestamp = str(row.get('Timestamp', f'entry_{idx}'))
-                data[timestamp] = {
-                    'N': float(row.get('N (ppm)', 0)),
-                    'P': float(row.get('P (ppm)', 0)),
-                    'K': float(row.get('K (ppm)', 0)),
-                    'ph': float(row.get('pH', 0)),
-                    'humidity': float(row.get('Humidity', 0)),
-                    'timestamp': timestamp
-                }
-            return data
+        entries, cursor = firebase_sync.fetch_new()
+        return records_to_frame(entries), cursor
     except Exception as e:
-        print(f"Google Sheets error: {e}")
+        print(f"Firebase sync error: {e}")
+    return None
+
+def sync_sensor_store(force=False):
+    """
+    Pull upstream history into the reading DB at most once per STORE_SYNC_INTERVAL.
+    Returns the number of rows written, or None if upstream could not be read.
+    """
+    global _last_store_sync
+    now = time.time()
+    if not force and reading_db.last_timestamp() is not None and now - _last_store_sync < STORE_SYNC_INTERVAL:
+        return 0
+    _last_store_sync = now
+    # Try Google Sheets first for historical data, unless its circuit is open
+    if source_selector.allow('sheets'):
+        try:
+            written = ingest_sheet_history()
+            source_selector.record('sheets', True)
+            return written
+        except Exception as e:
+            source_selector.record('sheets', False)
+            print(f"Google Sheets error: {e}")
     
     # Fallback to Firebase
+    if not source_selector.allow('firebase'):
+        return None
+    fetched = fetch_firebase_data()
+    source_selector.record('firebase', fetched is not None)
+    if fetched is None:
+        return None
+    frame, cursor = fetched
     try:
-        response = requests.get(f"{FIREBASE_URL}{FIREBASE_NODE}", timeout=10)
-        if response.status_code == 200:
-            return response.json()
-    except:
-        pass
+        written = store_frame(frame)
+    except Exception as e:
+        # The cursor stays put, so these entries are fetched again next time
+        print(f"Sensor store sync error: {e}")
+        return None
+    firebase_sync.advance(cursor)
+    return written
+
+# Derived results (chart JSON, trends, forecasts) keyed by the reading DB version
+# (LRU: every requested window adds keys)
+_history_cache = OrderedDict()
+_history_cache_lock = threading.Lock()
+HISTORY_CACHE_SIZE = 64
+
+def cached_for_history(name, version, compute):
+    """
+    The value cached under name for this reading DB version, else compute().
+    compute returns (value, version of the data it was computed from) and the
+    value is stored under that version, so a write that lands while computing
+    is never hidden behind an older version. compute runs outside the lock.
+    """
+    with _history_cache_lock:
+        cached = _history_cache.get(name)
+        if cached and cached[0] == version:
+            _history_cache.move_to_end(name)
+            return cached[1]
+    value, version = compute()
+    with _history_cache_lock:
+        _history_cache[name] = (version, value)
+        _history_cache.move_to_end(name)
+        while len(_history_cache) > HISTORY_CACHE_SIZE:
+            _history_cache.popitem(last=False)
+    return value
+
+# Recent readings per sensor as (reading DB version, backfill version, rings). Rows newer
+# than the newest one held are appended in place. A write at or before it (a late reading,
+# or one from another worker) bumps the DB's backfill version, and the rings are rebuilt
+# from the newest RECENT_CAPACITY rows. The rings hold twice RECENT_CAPACITY readings, so a
+# window of at most RECENT_CAPACITY stays intact while one catch-up appends behind it.
+_recent = (None, None, SensorRingBuffers(2 * RECENT_CAPACITY))
+_recent_lock = threading.Lock()
+
+def catch_up_recent():
+    """(reading DB version, SensorRingBuffers) of the newest readings"""
+    global _recent
+    version, _, rings = _recent
+    if reading_db.version == version:
+        return version, rings
+    with _recent_lock:
+        with reading_db.read_snapshot():
+            version, backfill_version, rings = _recent
+            if reading_db.version == version:
+                return version, rings
+            newest = None
+            if backfill_version == reading_db.backfill_version and rings.last_timestamp() is not None:
+                newest = reading_db.latest(RECENT_CAPACITY, after=rings.last_timestamp())
+            if newest is None or len(newest) == RECENT_CAPACITY:
+                # Out-of-order write, or more new rows than a window holds: start over
+                newest = reading_db.latest(RECENT_CAPACITY)
+                rings = SensorRingBuffers(2 * RECENT_CAPACITY)
+            rings.append_frame(newest)
+            _recent = (reading_db.version, reading_db.backfill_version, rings)
+        return _recent[0], rings
+
+# Used when the ingestion worker is not running: serve cached data, refresh in the background
+latest_cache = StaleWhileRevalidateCache(fetch_latest_data, ttl=INGEST_INTERVAL, max_stale=MAX_STALE,
+                                         valid=lambda value: value[0] is not None)
+history_cache = StaleWhileRevalidateCache(lambda: sync_sensor_store(force=True), ttl=STORE_SYNC_INTERVAL,
+                                          max_stale=MAX_STALE)
+
+def refresh_history():
+    if not ingestion_running():
+        history_cache.get()
+
+def load_sensor_frame(start=None, end=None):
+    """
+    SensorFrame of the history in [start, end), in at most about CHART_MAX_POINTS
+    rows: raw readings for short windows, per-bucket means from the coarsest
+    rollup tier needed otherwise. Built once per reading DB version and window.
+    """
+    refresh_history()
+    
+    def read():
+        history, tier, version = reading_db.history(start, end, max_points=CHART_MAX_POINTS)
+        return SensorFrame.from_history(history, tier, version), version
+    
+    return cached_for_history(('frame', start, end), reading_db.version, read)
+
+def history_window():
+    """Optional ?start=&end= bounds of the requested history window"""
+    bounds = []
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        try:
+            bounds.append(pd.Timestamp(value) if value else None)
+        except ValueError:
+            bounds.append(None)
+    return tuple(bounds)
+
+# Background ingestion: routes read the published snapshot instead of polling upstream
+ingestion_worker = IngestionWorker(fetch_latest_data, sync_sensor_store, INGEST_INTERVAL)
+
+def apply_stream_entries(entries):
+    """Merge pushed Firebase entries into history and publish the newest reading"""
+    store_frame(records_to_frame(entries))
+    firebase_sync.advance(max(entries))
+    publish_latest()
+
+def latest_stored_reading():
+    """Newest reading in the reading DB as (reading, ISO timestamp), or (None, None)"""
+    latest = reading_db.latest(1)
+    if latest.empty:
+        return None, None
+    row = latest.iloc[-1]
+    # Sensors missing from the reading read as 0, like the polling path
+    reading = {name: 0.0 if np.isnan(row[name]) else float(row[name]) for name in SENSOR_COLUMNS}
+    reading['timestamp'] = row['timestamp'].isoformat()
+    return reading, reading['timestamp']
+
+def publish_latest():
+    """Publish the newest stored reading to the ingestion snapshot"""
+    reading, timestamp = latest_stored_reading()
+    if reading:
+        ingestion_worker.publish(reading, timestamp)
+
+def stream_params():
+    """Resume the event stream after the last synced key"""
+    if firebase_sync.cursor is None:
+        return None
+    return {'orderBy': '"$key"', 'startAt': json.dumps(firebase_sync.cursor)}
+
+firebase_stream = FirebaseStreamListener(FIREBASE_URL, FIREBASE_NODE, apply_stream_entries, params=stream_params)
+
+def ingestion_running():
+    return ingestion_worker.is_running() or firebase_stream.is_running()
+
+@app.before_request
+def start_ingestion():
+    if not INGEST_ENABLED or ingestion_running():
+        return
+    weather_cache.prefetch(*DEFAULT_LOCATION)
+    if INGEST_MODE == 'stream':
+        firebase_stream.start()
+    else:
+        ingestion_worker.start()
+
+def latest_upstream_reading():
+    """Latest (reading, timestamp, age_seconds) from the ingestion snapshot or the SWR cache"""
+    if ingestion_running():
+        # Only the polling worker has a first poll to wait for; in stream mode
+        # the snapshot is published when the first event arrives (never, for an empty node)
+        if ingestion_worker.is_running():
+            snapshot = ingestion_worker.wait_for_snapshot(timeout=10)
+        else:
+            snapshot = ingestion_worker.snapshot
+        if snapshot.reading is None:
+            return None, None, None
+        age = time.time() - snapshot.fetched_at
+        if age > MAX_STALE:
+            return None, None, age
+        return snapshot.reading, snapshot.timestamp, age
+    value, age = latest_cache.get()
+    if value is None:
+        return None, None, age
+    return value[0], value[1], age
+
+def get_latest_reading():
+    """
+    Latest (reading, timestamp, age_seconds): the newer of the upstream reading
+    and the newest reading in the reading DB, which also holds readings
+    uploaded to /api/readings. A stored reading is read fresh (age 0).
+    """
+    reading, timestamp, age = latest_upstream_reading()
+    
+    def read():
+        with reading_db.read_snapshot():
+            return latest_stored_reading(), reading_db.version
+    
+    stored, stored_timestamp = cached_for_history('latest_stored', reading_db.version, read)
+    if stored is None:
+        return reading, timestamp, age
+    if reading is not None:
+        upstream_time = parse_timestamps([timestamp]).iloc[0]
+        # An upstream reading whose time cannot be read is kept, as before uploads existed
+        if pd.isna(upstream_time) or upstream_time >= pd.Timestamp(stored_timestamp):
+            return reading, timestamp, age
+    return stored, stored_timestamp, 0.0
+
+def fetch_location_name(lat, lon):
+    """Location name for the coordinates, from the geocode cache or Nominatim, or None if unknown"""
+    try:
+        return geocode_cache.get(lat, lon)
+    except Exception as e:
+        print(f"Geocode cache error: {e}")
     return None
 
+def lookup_location_name(lat, lon):
+    """Location name from Nominatim reverse geocoding, or None on failure"""
+    try:
+        location_url = f"{GEOCODE_URL}?lat={lat}&lon={lon}&format=json"
+        location_response = upstream.get(location_url)
+        if location_response.status_code == 200:
+            location_data = location_response.json()
+            address = location_data.get('address', {})
+            return address.get('city') or address.get('town') or address.get('municipality') or address.get('province', 'Philippines')
+    except Exception as e:
+        print(f"Geocoding error: {e}")
+    return None
+
+geocode_cache = GeocodeCache(GEOCODE_DB, lookup_location_name, precision=GEOCODE_PRECISION)
+
 def get_weather_data(lat=None, lon=None):
     """Get weather data based on coordinates or default to Philippines"""
     # Default to Indang, Cavite if no coordinates provided
     if lat is None or lon is None:
-        lat = 14.1953
-        lon = 120.8769
+        lat, lon = DEFAULT_LOCATION
+    
+    weather = weather_cache.get(lat, lon)
+    if weather is None:
+        return default_weather()
+    if weather['location'] is None:
+        return dict(weather, location="Philippines")
+    return weather
+
+def fetch_weather(lat, lon):
+    """Weather and location name from open-meteo and Nominatim, or None on failure"""
+    # Reverse geocoding runs alongside the forecast request
+    location_future = upstream_pool.submit(fetch_location_name, lat, lon)
     
     try:
         # Current weather and forecast
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true&hourly=temperature_2m,relativehumidity_2m,precipitation,weathercode,windspeed_10m&daily=weathercode,temperature_2m_max,temperature_2m_min,precipitation_sum&timezone=Asia/Manila"
-        response = requests.get(url, timeout=10)
+        url = f"{WEATHER_URL}?latitude={lat}&longitude={lon}&current_weather=true&hourly=temperature_2m,relativehumidity_2m,precipitation,weathercode,windspeed_10m&daily=weathercode,temperature_2m_max,temperature_2m_min,precipitation_sum&timezone=Asia/Manila"
+        response = upstream.get(url)
         
         if response.status_code == 200:
             data = response.json()
@@ -258,15 +602,11 @@ def get_weather_data(lat=None, lon=None):
             hourly = data.get('hourly', {})
             daily = data.get('daily', {})
             
-            # Get location name using reverse geocoding
-            location_url = f"https://nominatim.openstreetmap.org/reverse?lat={lat}&lon={lon}&format=json"
-            location_response = requests.get(location_url, timeout=5, headers={'User-Agent': 'HapagFarm/1.0'})
-            location_name = "Philippines"
-            
-            if location_response.status_code == 200:
-                location_data = location_response.json()
-                address = location_data.get('address', {})
-                location_name = address.get('city') or address.get('town') or address.get('municipality') or address.get('province', 'Philippines')
+            try:
+                location_name = location_future.result(timeout=GEOCODE_TIMEOUT)
+            except FutureTimeout:
+                print(f"Geocoding for ({lat}, {lon}) missed the {GEOCODE_TIMEOUT}s timeout")
+                location_name = None
             
             # Weather code mapping
             weather_codes = {
@@ -328,8 +668,13 @@ def get_weather_data(lat=None, lon=None):
             }
     except Exception as e:
         print(f"Weather error: {e}")
-    
-    # Fallback data
+    return None
+
+# Weather without a resolved location name is served but not cached, so the next request retries the lookup
+weather_cache = WeatherCache(fetch_weather, grid=WEATHER_GRID, refresh_ahead=WEATHER_REFRESH_AHEAD,
+                             cacheable=lambda weather: weather['location'] is not None)
+
+def default_weather():
     return {
         "location": "Philippines",
         "temperature": 28,
@@ -388,41 +733,12 @@ def get_fertilizer_recommendation(n, p, k):
     
     return recommendations
 
-def create_trend_chart(data):
-    if not data:
+def create_trend_chart(frame):
+    if frame is None or frame.empty:
         return None
     
     try:
-        # Process Firebase data structure
-        processed_data = []
-        for key, values in data.items():
-            if isinstance(values, dict):
-                # Extract timestamp and sensor values
-                timestamp = values.get('timestamp', values.get('date', key))
-                n_val = values.get('N', values.get('nitrogen', 0))
-                p_val = values.get('P', values.get('phosphorus', 0))
-                k_val = values.get('K', values.get('potassium', 0))
-                ph_val = values.get('ph', values.get('pH', 0))
-                hum_val = values.get('humidity', values.get('moisture', 0))
-                
-                try:
-                    processed_data.append({
-                        'timestamp': pd.to_datetime(timestamp),
-                        'N': float(n_val) if n_val else 0,
-                        'P': float(p_val) if p_val else 0,
-                        'K': float(k_val) if k_val else 0,
-                        'pH': float(ph_val) if ph_val else 0,
-                        'humidity': float(hum_val) if hum_val else 0
-                    })
-                except:
-                    continue
-        
-        if not processed_data:
-            return None
-        
-        # Create DataFrame and sort by timestamp
-        df = pd.DataFrame(processed_data)
-        df = df.sort_values('timestamp')
+        timestamps = frame.timestamps
         
         # Create the plot
         fig = go.Figure()
@@ -435,10 +751,10 @@ def create_trend_chart(data):
         ]
         
         for nutrient, color, label in nutrients:
-            if nutrient in df.columns and not df[nutrient].isna().all():
+            if frame.counts[nutrient].any():
                 fig.add_trace(go.Scatter(
-                    x=df['timestamp'],
-                    y=df[nutrient],
+                    x=timestamps,
+                    y=frame.values[nutrient],
                     mode='lines',
                     name=label,
                     line=dict(color=color, width=2),
@@ -446,10 +762,10 @@ def create_trend_chart(data):
                 ))
         
         # Add pH and humidity on secondary y-axis with dashed lines
-        if 'pH' in df.columns and not df['pH'].isna().all():
+        if frame.counts['ph'].any():
             fig.add_trace(go.Scatter(
-                x=df['timestamp'],
-                y=df['pH'],
+                x=timestamps,
+                y=frame.values['ph'],
                 mode='lines',
                 name='pH',
                 line=dict(color='#ef4444', width=2, dash='dash'),
@@ -457,10 +773,10 @@ def create_trend_chart(data):
                 hovertemplate='<b>pH</b>: %{y:.1f}<extra></extra>'
             ))
         
-        if 'humidity' in df.columns and not df['humidity'].isna().all():
+        if frame.counts['humidity'].any():
             fig.add_trace(go.Scatter(
-                x=df['timestamp'],
-                y=df['humidity'],
+                x=timestamps,
+                y=frame.values['humidity'],
                 mode='lines',
                 name='Humidity',
                 line=dict(color='#8b5cf6', width=2, dash='dot'),
@@ -528,48 +844,25 @@ def create_trend_chart(data):
         print(f"Chart creation error: {e}")
         return None
 
-def calculate_trend_analysis(data):
+def calculate_trend_analysis(frame):
     """Calculate trend statistics for nutrients"""
-    if not data:
+    if frame is None or frame.empty:
         return {}
     
     try:
-        # Process data similar to chart function
-        processed_data = []
-        for key, values in data.items():
-            if isinstance(values, dict):
-                timestamp = values.get('timestamp', values.get('date', key))
-                n_val = values.get('N', values.get('nitrogen', 0))
-                p_val = values.get('P', values.get('phosphorus', 0))
-                k_val = values.get('K', values.get('potassium', 0))
-                
-                try:
-                    processed_data.append({
-                        'timestamp': pd.to_datetime(timestamp),
-                        'N': float(n_val) if n_val else 0,
-                        'P': float(p_val) if p_val else 0,
-                        'K': float(k_val) if k_val else 0
-                    })
-                except:
-                    continue
-        
-        if len(processed_data) < 2:
+        if len(frame) < 2:
             return {'N': 'stable', 'P': 'stable', 'K': 'stable'}
         
-        df = pd.DataFrame(processed_data).sort_values('timestamp')
         trends = {}
         
         for nutrient in ['N', 'P', 'K']:
-            if nutrient in df.columns:
-                recent_avg = df[nutrient].tail(3).mean()
-                older_avg = df[nutrient].head(3).mean()
-                
-                if recent_avg > older_avg * 1.1:
-                    trends[nutrient] = 'increasing'
-                elif recent_avg < older_avg * 0.9:
-                    trends[nutrient] = 'decreasing'
-                else:
-                    trends[nutrient] = 'stable'
+            recent_avg = frame.edge_mean(nutrient, 3, newest=True)
+            older_avg = frame.edge_mean(nutrient, 3, newest=False)
+            
+            if recent_avg > older_avg * 1.1:
+                trends[nutrient] = 'increasing'
+            elif recent_avg < older_avg * 0.9:
+                trends[nutrient] = 'decreasing'
             else:
                 trends[nutrient] = 'stable'
         
@@ -578,16 +871,46 @@ def calculate_trend_analysis(data):
         return {'N': 'stable', 'P': 'stable', 'K': 'stable'}
 
 # Routes
+# Last value each dashboard source produced, used when a source misses the budget
+_dashboard_sources = {}
+
+def fetch_dashboard_sources(sources, budget):
+    """
+    Run independent data sources concurrently and wait at most budget seconds
+    for all of them. A source that is late or fails yields its last value.
+    sources: {name: (callable, default)}
+    """
+    futures = {name: dashboard_pool.submit(fn) for name, (fn, _) in sources.items()}
+    deadline = time.monotonic() + budget
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+            _dashboard_sources[name] = results[name]
+        except FutureTimeout:
+            print(f"Dashboard source '{name}' missed the {budget}s budget")
+            results[name] = _dashboard_sources.get(name, sources[name][1])
+        except Exception as e:
+            print(f"Dashboard source '{name}' error: {e}")
+            results[name] = _dashboard_sources.get(name, sources[name][1])
+    return results
+
 @app.route('/')
 def index():
-    # Fetch real-time data
-    data, timestamp = fetch_latest_data()
+    # Fetch real-time data and weather concurrently
+    sources = fetch_dashboard_sources({
+        'reading': (get_latest_reading, (None, None, None)),
+        'weather': (get_weather_data, default_weather()),
+    }, DASHBOARD_BUDGET)
+    data, timestamp, age = sources['reading']
+    weather = sources['weather']
     
     # Default values (only used when no data)
     sensor_data = {
         'N': 0, 'P': 0, 'K': 0, 'ph': 0, 'humidity': 0,
         'ec': 0, 'temperature': 0,
         'timestamp': 'No data',
+        'age_seconds': None,
         'connected': False
     }
     
@@ -602,6 +925,7 @@ def index():
                 'ec': float(data.get('ec', 0)),
                 'temperature': float(data.get('temperature', 0)),
                 'timestamp': timestamp or 'Unknown',
+                'age_seconds': round(age, 1),
                 'connected': True
             })
         except:
@@ -637,9 +961,6 @@ def index():
             confidence = 0
         npk_status = None
     
-    # Get weather data
-    weather = get_weather_data()
-    
     # Check for alerts
     alerts = []
     danger_count = 0
@@ -679,16 +1000,19 @@ def index():
 
 @app.route('/analytics')
 def analytics():
-    data = fetch_firebase_data()
+    start, end = history_window()
+    frame = load_sensor_frame(start, end)
     
     # Check if we have any data
-    has_data = data is not None and len(data) > 0
+    has_data = not frame.empty
     
-    chart_json = create_trend_chart(data) if has_data else None
-    trends = calculate_trend_analysis(data) if has_data else {}
+    chart_json = cached_for_history(('chart', start, end), frame.version,
+                                    lambda: (create_trend_chart(frame), frame.version)) if has_data else None
+    trends = cached_for_history(('trends', start, end), frame.version,
+                                lambda: (calculate_trend_analysis(frame), frame.version)) if has_data else {}
     
     # Fetch current sensor data for gauges (same as Dashboard)
-    current_data, current_timestamp = fetch_latest_data()
+    current_data, current_timestamp, current_age = get_latest_reading()
     current_sensor = {
         'N': 0, 'P': 0, 'K': 0, 'ph': 0, 'humidity': 0,
         'ec': 0, 'temperature': 0, 'health_score': 0
@@ -718,33 +1042,21 @@ def analytics():
     summary_stats = {}
     if has_data:
         try:
-            values = []
-            for key, entry in data.items():
-                if isinstance(entry, dict):
-                    values.append({
-                        'N': float(entry.get('N', 0)),
-                        'P': float(entry.get('P', 0)),
-                        'K': float(entry.get('K', 0)),
-                        'pH': float(entry.get('ph', 0)),
-                        'humidity': float(entry.get('humidity', 0))
-                    })
-            
-            if values:
-                df_stats = pd.DataFrame(values)
-                summary_stats = {
-                    'total_readings': len(values),
-                    'avg_N': df_stats['N'].mean(),
-                    'avg_P': df_stats['P'].mean(),
-                    'avg_K': df_stats['K'].mean(),
-                    'avg_pH': df_stats['pH'].mean(),
-                    'avg_humidity': df_stats['humidity'].mean()
-                }
+            summary = frame.summary()
+            summary_stats = {
+                'total_readings': summary['readings'],
+                'avg_N': summary['N'],
+                'avg_P': summary['P'],
+                'avg_K': summary['K'],
+                'avg_pH': summary['ph'],
+                'avg_humidity': summary['humidity']
+            }
         except:
             pass
     
     return render_template('analytics.html', 
                          chart_json=chart_json,
-                         has_data=data is not None,
+                         has_data=has_data,
                          trends=trends,
                          summary_stats=summary_stats,
                          current_sensor=current_sensor)
@@ -807,6 +1119,7 @@ def predict():
 def settings():
     return render_template('settings.html', 
                          model_loaded=model_loaded,
+                         source_health=source_selector.stats(),
                          firebase_url=FIREBASE_URL,
                          firebase_node=FIREBASE_NODE)
 
@@ -834,7 +1147,7 @@ def ml_models():
 
 @app.route('/api/refresh')
 def api_refresh():
-    data, timestamp = fetch_latest_data()
+    data, timestamp, age = get_latest_reading()
     
     if data:
         try:
@@ -846,21 +1159,116 @@ def api_refresh():
                 'humidity': float(data.get('humidity', 0)),
                 'temperature': float(data.get('temperature', 0)),
                 'timestamp': timestamp,
+                'age_seconds': round(age, 1),
                 'connected': True
             }
             return jsonify(sensor_data)
         except:
             pass
     
-    return jsonify({'connected': False})
+    return jsonify({'connected': False, 'age_seconds': round(age, 1) if age is not None else None})
 
 @app.route('/api/test_connection')
 def api_test_connection():
-    data = fetch_firebase_data()
-    if data:
-        return jsonify({'success': True, 'count': len(data)})
+    refresh_history()
+    count = len(reading_db)
+    if count:
+        return jsonify({'success': True, 'count': count})
     return jsonify({'success': False})
 
+def ingest_authorized(authorization):
+    """Whether an Authorization header value may upload readings"""
+    if INGEST_TOKEN is None:
+        return INGEST_OPEN
+    return hmac.compare_digest(authorization.encode(), f"Bearer {INGEST_TOKEN}".encode())
+
+@app.route('/api/readings', methods=['POST'])
+def api_readings():
+    """
+    Batch ingestion for devices: a JSON array, NDJSON, CSV or binary
+    (see wire_format) body of readings.
+    Readings with an unparseable timestamp, a non-numeric or an out-of-range
+    value are rejected, duplicate timestamps keep the last reading, and the
+    batch is written in one transaction.
+    """
+    if not ingest_authorized(request.headers.get('Authorization', '')):
+        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        frame, invalid = parse_batch(request.get_data(), request.content_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    parsed = len(frame)
+    frame, out_of_range = validate_frame(frame)
+    frame = frame.drop_duplicates(reading_key(frame), keep='last')
+    duplicates = parsed - len(out_of_range) - len(frame)
+    rejected = invalid + len(out_of_range)
+    
+    try:
+        written = reading_db.insert_frame(frame, device_id=request.args.get('device_id', DEFAULT_DEVICE))
+    except Exception as e:
+        print(f"Reading ingestion error: {e}")
+        return jsonify({'error': 'Failed to store readings'}), 500
+    
+    return jsonify({'accepted': written, 'rejected': rejected, 'duplicates': duplicates})
+
+@app.route('/api/recommend/batch', methods=['POST'])
+def api_recommend_batch():
+    """
+    Crop recommendations for many readings at once.
+    Body: a JSON array of readings (or {"readings": [...]}), or {"history": true,
+    "start": ..., "end": ...} to score the stored readings in that window.
+    ?scores=0 leaves out the per-crop score matrix.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict) and payload.get('history'):
+        try:
+            start = pd.Timestamp(payload['start']) if payload.get('start') else None
+            end = pd.Timestamp(payload['end']) if payload.get('end') else None
+        except ValueError:
+            return jsonify({'error': 'Invalid start or end'}), 400
+        history = reading_db.range(start, end)
+        columns = {'N': 'N', 'P': 'P', 'K': 'K', 'pH': 'ph', 'humidity': 'humidity'}
+        readings = np.column_stack([history[columns[param]].to_numpy(dtype=np.float64) for param in CROP_PARAMETERS]) \
+            if not history.empty else np.empty((0, len(CROP_PARAMETERS)))
+        timestamps = [ts.isoformat() for ts in history['timestamp']]
+    else:
+        records = payload.get('readings') if isinstance(payload, dict) else payload
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            return jsonify({'error': 'Expected a list of readings'}), 400
+        mapped = [READING_SCHEMA.reading(record, default=np.nan) for record in records]
+        readings = np.array([[reading['N'], reading['P'], reading['K'], reading['ph'], reading['humidity']]
+                             for reading in mapped], dtype=np.float64).reshape(-1, len(CROP_PARAMETERS))
+        timestamps = None
+    
+    names, best_scores, scores = crop_engine.recommend(readings)
+    result = {
+        'count': len(names),
+        'recommendations': names.tolist(),
+        'best_scores': best_scores.tolist(),
+    }
+    if timestamps is not None:
+        result['timestamps'] = timestamps
+    if request.args.get('scores', '1') != '0':
+        result['crops'] = crop_engine.crops.tolist()
+        result['scores'] = scores.tolist()
+    return jsonify(result)
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Upstream connection and ingestion counters"""
+    return jsonify({
+        'upstream': upstream.stats(),
+        'weather_cache': weather_cache.stats(),
+        'geocode_cache': geocode_cache.stats(),
+        'sources': source_selector.stats(),
+        'sheet': sheet_source.stats(),
+        'sheet_history': sheet_history_source.stats(),
+        'single_flight': upstream_flight.stats(),
+        'latest_cache': latest_cache.stats(),
+        'history_cache': history_cache.stats()
+    })
+
 @app.route('/api/weather')
 def api_weather():
     """API endpoint for weather with location"""
@@ -872,37 +1280,51 @@ def api_weather():
 @app.route('/api/analytics_data')
 def api_analytics_data():
     """API endpoint for real-time analytics updates"""
-    data = fetch_firebase_data()
-    trends = calculate_trend_analysis(data)
+    start, end = history_window()
+    frame = load_sensor_frame(start, end)
+    trends = cached_for_history(('trends', start, end), frame.version,
+                                lambda: (calculate_trend_analysis(frame), frame.version))
     
     return jsonify({
         'trends': trends,
-        'has_data': data is not None,
-        'data_count': len(data) if data else 0
+        'has_data': not frame.empty,
+        'data_count': frame.total_readings()
     })
 
+def forecast_history(recent):
+    """Run the sensor forecaster over the recent-readings ring buffers"""
+    window = get_forecaster().history_window
+    forecast_columns = {'N': 'N', 'P': 'P', 'K': 'K', 'Soil_pH': 'ph', 'Humidity': 'humidity', 'Temperature': 'temperature'}
+    sensor_history = {
+        sensor: recent.window(column, min(window, RECENT_CAPACITY))[1]
+        for sensor, column in forecast_columns.items()
+    }
+    return generate_forecasts(sensor_history)
+
 @app.route('/api/forecast')
 def api_forecast():
     """API endpoint for sensor forecasting"""
-    data = fetch_firebase_data()
-    
-    if not data:
+    refresh_history()
+    version, recent = catch_up_recent()
+    if recent.last_timestamp() is None:
         return jsonify({'error': 'No data available'})
     
-    # Extract historical readings for each sensor
-    sensor_history = {'N': [], 'P': [], 'K': [], 'Soil_pH': [], 'Humidity': [], 'Temperature': []}
-    
-    for key, values in data.items():
-        if isinstance(values, dict):
-            sensor_history['N'].append(float(values.get('N', 0)))
-            sensor_history['P'].append(float(values.get('P', 0)))
-            sensor_history['K'].append(float(values.get('K', 0)))
-            sensor_history['Soil_pH'].append(float(values.get('ph', 0)))
-            sensor_history['Humidity'].append(float(values.get('humidity', 0)))
-            sensor_history['Temperature'].append(float(values.get('temperature', 0)))
-    
-    forecasts = generate_forecasts(sensor_history)
+    forecasts = cached_for_history('forecast', version, lambda: (forecast_history(recent), version))
     return jsonify(forecasts)
 
+@app.route('/api/recent')
+def api_recent():
+    """Newest readings per sensor for live charts (?n= readings, default 50)"""
+    n = min(max(request.args.get('n', 50, type=int), 0), RECENT_CAPACITY)
+    _, recent = catch_up_recent()
+    readings = {}
+    for name in SENSOR_COLUMNS:
+        timestamps, values = recent.window(name, n)
+        readings[name] = {
+            'timestamps': [pd.Timestamp(int(ts)).isoformat() for ts in timestamps],
+            'values': values.tolist()
+        }
+    return jsonify(readings)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
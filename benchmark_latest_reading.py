@@ -0,0 +1,112 @@
+# Hapag Farm - Latest Reading Benchmark
+# Compares the full-export latest-reading path with the tail-only reader
+# against a local stand-in for the Google Sheets endpoints.
+#
+#   python benchmark_latest_reading.py              # 1k .. 100k rows, both paths
+#   python benchmark_latest_reading.py --full       # up to 1M rows
+import argparse
+import io
+import re
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+from sheet_tail import SheetTailReader
+from upstream_client import UpstreamClient
+
+HEADER = "Timestamp,N (ppm),P (ppm),K (ppm),pH,Humidity,Temp,EC\n"
+
+
+class FakeSheet:
+    def __init__(self, rows):
+        self.lines = [self.row(i) for i in range(rows)]
+        self.export = (HEADER + ''.join(self.lines)).encode()
+
+    @staticmethod
+    def row(i):
+        return f"2024-01-01 00:00:{i % 60:02d},{90 + i % 50},{5 + i % 3},{50 + i % 40},6.5,70,28,1.2\n"
+
+    def append(self):
+        line = self.row(len(self.lines))
+        self.lines.append(line)
+        self.export += line.encode()
+
+
+def make_handler(sheet):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.endswith('/export'):
+                body = sheet.export
+            else:
+                query = parse_qs(url.query).get('tq', [''])[0]
+                if query.startswith('select count'):
+                    body = f"count Timestamp\n{len(sheet.lines)}\n".encode()
+                else:
+                    offset = int(re.search(r'offset (\d+)', query).group(1))
+                    body = (HEADER + ''.join(sheet.lines[offset:])).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    return Handler
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def run(rows, iterations, include_full):
+    sheet = FakeSheet(rows)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(sheet))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    client = UpstreamClient()
+    results = {}
+
+    tail = SheetTailReader('bench', client=client, base_url=base_url)
+    tail.latest_row()
+    samples = []
+    for _ in range(iterations):
+        sheet.append()
+        start = time.perf_counter()
+        tail.latest_row()
+        samples.append((time.perf_counter() - start) * 1000)
+    results['tail'] = samples
+
+    if include_full:
+        samples = []
+        for _ in range(iterations):
+            sheet.append()
+            start = time.perf_counter()
+            content = client.get(f"{base_url}/spreadsheets/d/bench/export").content
+            pd.read_csv(io.BytesIO(content)).iloc[-1]
+            samples.append((time.perf_counter() - start) * 1000)
+        results['full export'] = samples
+
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latest-reading latency vs sheet length')
+    parser.add_argument('--full', action='store_true', help='include 1M rows')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    sizes = [1_000, 10_000, 100_000] + ([1_000_000] if args.full else [])
+    print(f"{'rows':>10} {'path':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for rows in sizes:
+        results = run(rows, args.iterations, include_full=True)
+        for path, samples in results.items():
+            print(f"{rows:>10} {path:>12} {statistics.median(samples):>9.2f} {percentile(samples, 99):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# Hapag Farm - ML Prediction Benchmark
+# Compares the original safe_ml_prediction path (one-row DataFrame, predict
+# then predict_proba) with CropClassifier.predict (array input, one
+# predict_proba). Uses hapag_crop_model.pkl / label_encoder.pkl when present,
+# otherwise a 100-tree stand-in trained like train_model.py.
+#
+#   python benchmark_ml_prediction.py
+#   python benchmark_ml_prediction.py --iterations 2000
+import argparse
+import os
+import statistics
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+from crop_classifier import FEATURES, CropClassifier
+
+CROPS = [
+    "Sweet Potatoes", "Munggo", "Peanuts", "Sitaw", "Tomatoes", "Lettuce",
+    "Eggplant", "Chili", "Cabbage", "Bell Peppers", "Broccoli", "Corn",
+    "Kangkong", "Mustasa", "Garlic", "Radish", "Carrots", "Potatoes",
+    "Banana", "Onion", "Okra", "Bokchoy", "Rice"
+]
+
+
+def load_models():
+    if os.path.exists('hapag_crop_model.pkl') and os.path.exists('label_encoder.pkl'):
+        return joblib.load('hapag_crop_model.pkl'), joblib.load('label_encoder.pkl'), 'hapag_crop_model.pkl'
+    rng = np.random.default_rng(42)
+    X = pd.DataFrame(rng.random((2000, 5)) * [200, 100, 300, 9, 100] + [0, 0, 0, 4.5, 0], columns=FEATURES)
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(rng.choice(CROPS, len(X)))
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(X, y)
+    return model, encoder, 'stand-in model'
+
+
+def legacy_prediction(model, encoder, n, p, k, ph, hum):
+    """The safe_ml_prediction body before CropClassifier (validation included)"""
+    def valid(value, min_val=0, max_val=1000):
+        try:
+            return min_val <= float(value) <= max_val
+        except (TypeError, ValueError):
+            return False
+
+    if not all(valid(x) for x in [n, p, k]) or not valid(ph, 0, 14) or not valid(hum, 0, 100):
+        return None, 0
+    input_df = pd.DataFrame([[n, p, k, ph, hum]], columns=FEATURES)
+    prediction_idx = model.predict(input_df)[0]
+    if not 0 <= prediction_idx < len(encoder.classes_):
+        return None, 0
+    label = encoder.classes_[prediction_idx]
+    return label.title(), np.max(model.predict_proba(input_df)) * 100
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def timed(predict, readings):
+    samples, results = [], []
+    for reading in readings:
+        start = time.perf_counter()
+        results.append(predict(*reading))
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Single-reading crop prediction latency')
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    model, encoder, source = load_models()
+    classifier = CropClassifier(model, encoder, {})
+    rng = np.random.default_rng(7)
+    readings = (rng.random((args.iterations, 5)) * [200, 100, 300, 9, 100] + [0, 0, 0, 4.5, 0]).tolist()
+
+    # Warm up both paths before measuring
+    for reading in readings[:20]:
+        legacy_prediction(model, encoder, *reading)
+        classifier.predict(*reading)
+
+    legacy_samples, legacy_results = timed(lambda *r: legacy_prediction(model, encoder, *r), readings)
+    fast_samples, fast_results = timed(classifier.predict, readings)
+    mismatches = sum(a[0] != b[0] or not np.isclose(a[1], b[1]) for a, b in zip(legacy_results, fast_results))
+
+    print(f"{source}, {args.iterations} predictions, {mismatches} mismatches")
+    print(f"{'path':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for path, samples in (('legacy', legacy_samples), ('fast', fast_samples)):
+        print(f"{path:>10} {statistics.median(samples):>9.2f} {percentile(samples, 99):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,98 +1,120 @@
 # Hapag Farm - Binary Logic Crop Recommendation System
+import numpy as np
+
+# Thresholds in ppm
+N_LOW = 88.9
+N_HIGH = 177.8
+P_LOW = 4.1
+P_HIGH = 8.1
+K_LOW = 40.7
+K_HIGH = 103.7
+
+# Bit positions, most significant first: [N_high, N_low, P_high, P_low, K_high]
+N_HIGH_BIT = 0b10000
+N_LOW_BIT = 0b01000
+P_HIGH_BIT = 0b00100
+P_LOW_BIT = 0b00010
+K_HIGH_BIT = 0b00001
+
+CROP_MAP = {
+    "00000": [],
+    "00001": ["OKRA", "GARLIC"],
+    "00010": ["ONION"],
+    "00011": ["SWEET POTATOES", "SITAW"],
+    "00100": [],
+    "00101": [],
+    "00110": ["BANANA", "ONION"],
+    "00111": ["LETTUCE", "RADISH", "SITAW"],
+    "01000": [],
+    "01001": ["LETTUCE", "GARLIC"],
+    "01010": ["ONION"],
+    "01011": ["SITAW"],
+    "01100": [],
+    "01101": [],
+    "01110": [],
+    "01111": ["LETTUCE", "CHILI", "BELL PEPPERS", "BROCCOLI", "CORN", "TOMATOES", "EGGPLANT"],
+    "10000": ["CABBAGE", "CORN", "MUSTASA"],
+    "10001": ["LETTUCE", "GARLIC"],
+    "10010": ["LETTUCE", "CABBAGE", "MUSTASA"],
+    "10011": ["TOMATOES", "CHILI", "BELL PEPPERS", "BROCCOLI", "CORN"],
+    "10100": ["TOMATOES", "CABBAGE", "KANGKONG", "MUSTASA"],
+    "10101": ["CHILI", "BELL PEPPERS"],
+    "10110": ["BANANA", "ONION", "KANGKONG", "MUSTASA"],
+    "10111": ["EGGPLANT", "CORN", "TOMATOES"],
+    "11000": ["CABBAGE", "CORN", "MUSTASA"],
+    "11001": ["EGGPLANT", "LETTUCE"],
+    "11010": ["CABBAGE", "ONION", "MUSTASA"],
+    "11011": ["TOMATOES", "EGGPLANT", "CABBAGE", "BROCCOLI", "CORN", "CHILI", "BELL PEPPERS"],
+    "11100": ["TOMATOES", "CABBAGE", "KANGKONG", "MUSTASA"],
+    "11101": ["CABBAGE"],
+    "11110": ["CABBAGE", "ONION", "KANGKONG", "MUSTASA"],
+    "11111": ["TOMATOES", "EGGPLANT", "CABBAGE", "BROCCOLI", "CORN", "CHILI", "BELL PEPPERS", "LETTUCE"]
+}
+
+# CROP_MAP compiled into a 32-slot table indexed by the integer code
+CROP_TABLE = tuple(tuple(CROP_MAP[format(code, '05b')]) for code in range(32))
+CODE_STRINGS = tuple(format(code, '05b') for code in range(32))
+CONFIDENCE_TABLE = np.array([95 if crops else 0 for crops in CROP_TABLE], dtype=np.int8)
+
+# Object array so a whole array of codes maps to crop tuples in one indexing step
+_CROP_ARRAY = np.empty(32, dtype=object)
+_CROP_ARRAY[:] = CROP_TABLE
+STATUS_LABELS = np.array(['LOW', 'MEDIUM', 'HIGH'])
+
+def get_npk_code(n, p, k):
+    """
+    Convert NPK values to the 5-bit integer code (see the bit positions above)
+    """
+    code = 0
+    if n > N_HIGH:
+        code |= N_HIGH_BIT
+    if n < N_LOW:
+        code |= N_LOW_BIT
+    if p > P_HIGH:
+        code |= P_HIGH_BIT
+    if p < P_LOW:
+        code |= P_LOW_BIT
+    if k > K_HIGH:
+        code |= K_HIGH_BIT
+    return code
 
 def get_npk_binary_code(n, p, k):
     """
     Convert NPK values to 5-bit binary code
     Bit positions: [N_high, N_low, P_high, P_low, K_high]
     """
-    # Thresholds in ppm
-    N_LOW = 88.9
-    N_HIGH = 177.8
-    P_LOW = 4.1
-    P_HIGH = 8.1
-    K_LOW = 40.7
-    K_HIGH = 103.7
-    
-    # Determine N bits
-    n_high = 1 if n > N_HIGH else 0
-    n_low = 1 if n < N_LOW else 0
-    
-    # Determine P bits
-    p_high = 1 if p > P_HIGH else 0
-    p_low = 1 if p < P_LOW else 0
-    
-    # Determine K bit
-    k_high = 1 if k > K_HIGH else 0
-    
-    # Create 5-bit binary code
-    binary_code = f"{n_high}{n_low}{p_high}{p_low}{k_high}"
-    return binary_code
+    return CODE_STRINGS[get_npk_code(n, p, k)]
 
 def get_crops_from_binary(binary_code):
     """
-    Map binary code to recommended crops
-    """
-    crop_map = {
-        "00000": [],
-        "00001": ["OKRA", "GARLIC"],
-        "00010": ["ONION"],
-        "00011": ["SWEET POTATOES", "SITAW"],
-        "00100": [],
-        "00101": [],
-        "00110": ["BANANA", "ONION"],
-        "00111": ["LETTUCE", "RADISH", "SITAW"],
-        "01000": [],
-        "01001": ["LETTUCE", "GARLIC"],
-        "01010": ["ONION"],
-        "01011": ["SITAW"],
-        "01100": [],
-        "01101": [],
-        "01110": [],
-        "01111": ["LETTUCE", "CHILI", "BELL PEPPERS", "BROCCOLI", "CORN", "TOMATOES", "EGGPLANT"],
-        "10000": ["CABBAGE", "CORN", "MUSTASA"],
-        "10001": ["LETTUCE", "GARLIC"],
-        "10010": ["LETTUCE", "CABBAGE", "MUSTASA"],
-        "10011": ["TOMATOES", "CHILI", "BELL PEPPERS", "BROCCOLI", "CORN"],
-        "10100": ["TOMATOES", "CABBAGE", "KANGKONG", "MUSTASA"],
-        "10101": ["CHILI", "BELL PEPPERS"],
-        "10110": ["BANANA", "ONION", "KANGKONG", "MUSTASA"],
-        "10111": ["EGGPLANT", "CORN", "TOMATOES"],
-        "11000": ["CABBAGE", "CORN", "MUSTASA"],
-        "11001": ["EGGPLANT", "LETTUCE"],
-        "11010": ["CABBAGE", "ONION", "MUSTASA"],
-        "11011": ["TOMATOES", "EGGPLANT", "CABBAGE", "BROCCOLI", "CORN", "CHILI", "BELL PEPPERS"],
-        "11100": ["TOMATOES", "CABBAGE", "KANGKONG", "MUSTASA"],
-        "11101": ["CABBAGE"],
-        "11110": ["CABBAGE", "ONION", "KANGKONG", "MUSTASA"],
-        "11111": ["TOMATOES", "EGGPLANT", "CABBAGE", "BROCCOLI", "CORN", "CHILI", "BELL PEPPERS", "LETTUCE"]
-    }
-    
-    return crop_map.get(binary_code, [])
+    Map binary code (a '01011' string or its integer value) to recommended crops
+    """
+    if isinstance(binary_code, str):
+        try:
+            binary_code = int(binary_code, 2)
+        except ValueError:
+            return []
+    if not 0 <= binary_code < len(CROP_TABLE):
+        return []
+    return list(CROP_TABLE[binary_code])
 
 def get_binary_crop_recommendation(n, p, k):
     """
     Get crop recommendation using binary logic system
     Returns: (crops_list, binary_code, confidence)
     """
-    binary_code = get_npk_binary_code(n, p, k)
-    crops = get_crops_from_binary(binary_code)
+    code = get_npk_code(n, p, k)
+    crops = list(CROP_TABLE[code])
     
     # Calculate confidence based on how many crops match
-    confidence = 95 if len(crops) > 0 else 0
+    confidence = 95 if crops else 0
     
-    return crops, binary_code, confidence
+    return crops, CODE_STRINGS[code], confidence
 
 def get_npk_status(n, p, k):
     """
     Get human-readable NPK status
     """
-    N_LOW = 88.9
-    N_HIGH = 177.8
-    P_LOW = 4.1
-    P_HIGH = 8.1
-    K_LOW = 40.7
-    K_HIGH = 103.7
-    
     n_status = "HIGH" if n > N_HIGH else ("LOW" if n < N_LOW else "MEDIUM")
     p_status = "HIGH" if p > P_HIGH else ("LOW" if p < P_LOW else "MEDIUM")
     k_status = "HIGH" if k > K_HIGH else ("LOW" if k < K_LOW else "MEDIUM")
@@ -102,3 +124,39 @@ def get_npk_status(n, p, k):
         "P": p_status,
         "K": k_status
     }
+
+def get_npk_codes(n, p, k):
+    """
+    Integer codes for arrays of NPK values (uint8 array, one code per sample)
+    """
+    n = np.asarray(n, dtype=np.float64)
+    p = np.asarray(p, dtype=np.float64)
+    k = np.asarray(k, dtype=np.float64)
+    codes = (n > N_HIGH).astype(np.uint8) << 4
+    codes |= (n < N_LOW).astype(np.uint8) << 3
+    codes |= (p > P_HIGH).astype(np.uint8) << 2
+    codes |= (p < P_LOW).astype(np.uint8) << 1
+    codes |= (k > K_HIGH).astype(np.uint8)
+    return codes
+
+def get_npk_levels(n, p, k):
+    """
+    NPK status levels for arrays of values: 0 LOW, 1 MEDIUM, 2 HIGH
+    (STATUS_LABELS[levels] gives the names)
+    """
+    levels = {}
+    for name, values, low, high in (('N', n, N_LOW, N_HIGH), ('P', p, P_LOW, P_HIGH), ('K', k, K_LOW, K_HIGH)):
+        values = np.asarray(values, dtype=np.float64)
+        levels[name] = (1 + (values > high) - (values < low)).astype(np.int8)
+    return levels
+
+def get_binary_crop_recommendations(n, p, k):
+    """
+    Vectorized get_binary_crop_recommendation for arrays of NPK values
+    Returns: (crops, codes, confidence, status) where crops is an object array
+    of crop tuples, codes the integer codes (CODE_STRINGS[code] is the bit
+    string), confidence an int8 array and status maps N/P/K to label arrays
+    """
+    codes = get_npk_codes(n, p, k)
+    status = {name: STATUS_LABELS[levels] for name, levels in get_npk_levels(n, p, k).items()}
+    return _CROP_ARRAY[codes], codes, CONFIDENCE_TABLE[codes], status
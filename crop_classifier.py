@@ -0,0 +1,62 @@
+# Hapag Farm - Crop Classifier Inference
+import numpy as np
+import pandas as pd
+from sensor_schema import SENSOR_BOUNDS
+
+# Model feature order (see train_model.py) and the sensor field whose bounds apply to each
+FEATURES = ['N', 'P', 'K', 'Soil_pH', 'Humidity']
+FEATURE_FIELDS = ['N', 'P', 'K', 'ph', 'humidity']
+FEATURE_MIN = np.array([SENSOR_BOUNDS[field][0] for field in FEATURE_FIELDS], dtype=np.float64)
+FEATURE_MAX = np.array([SENSOR_BOUNDS[field][1] for field in FEATURE_FIELDS], dtype=np.float64)
+DEFAULT_CONFIDENCE = 85.0
+
+
+class CropClassifier:
+    """
+    Single-reading inference for the crop model.
+
+    Inputs are validated as one float array and predict_proba runs once:
+    the predicted class is its argmax (what predict returns) and the
+    confidence its probability. Model classes are label encoder indexes;
+    their display names (via display_names, e.g. ML_TO_FILIPINO) are
+    resolved once here, so a prediction is an array lookup. A model fitted
+    on a DataFrame gets its row as a DataFrame with the same column names.
+    """
+
+    def __init__(self, model, encoder, display_names):
+        self.model = model
+        labels = encoder.classes_
+        self.names = []
+        for index in model.classes_:
+            if isinstance(index, (int, np.integer)) and 0 <= index < len(labels):
+                label = str(labels[index])
+                self.names.append(display_names.get(label.lower(), label.title()))
+            else:
+                self.names.append(None)
+        self._name_by_class = dict(zip(model.classes_.tolist(), self.names))
+        self.has_proba = hasattr(model, 'predict_proba')
+        names = getattr(model, 'feature_names_in_', None)
+        self.columns = list(names) if names is not None else None
+
+    def predict(self, n, p, k, ph, hum):
+        """(display name, confidence %), or (None, 0) for invalid input or an unknown class"""
+        try:
+            row = np.array([[n, p, k, ph, hum]], dtype=np.float64)
+        except (TypeError, ValueError):
+            return None, 0
+        if not ((row >= FEATURE_MIN) & (row <= FEATURE_MAX)).all():
+            return None, 0
+        if self.columns is not None:
+            row = pd.DataFrame(row, columns=self.columns)
+
+        try:
+            if self.has_proba:
+                probabilities = self.model.predict_proba(row)[0]
+                index = int(probabilities.argmax())
+                name, confidence = self.names[index], float(probabilities[index]) * 100
+            else:
+                name, confidence = self._name_by_class.get(self.model.predict(row)[0]), DEFAULT_CONFIDENCE
+        except Exception as e:
+            print(f"Crop model prediction error: {e}")
+            return None, 0
+        return (name, confidence) if name is not None else (None, 0)
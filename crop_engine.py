@@ -0,0 +1,52 @@
+# Hapag Farm - Vectorized Crop Scoring
+import numpy as np
+
+# Order of the parameter columns in every readings matrix
+CROP_PARAMETERS = ['N', 'P', 'K', 'pH', 'humidity']
+
+
+class CropEngine:
+    """
+    Scores soil readings against every crop at once.
+
+    The crop database is compiled into (crops x parameters) min/max
+    matrices. A parameter inside a crop's range earns 2 points, one outside
+    but within `near` of either bound earns 1; scores are percentages of the
+    maximum (10 points). Readings are an (n x 5) array in CROP_PARAMETERS
+    order; missing values (NaN) earn nothing.
+    """
+
+    def __init__(self, crop_database, near=20, min_score=40, default='Rice'):
+        self.crops = np.array(list(crop_database))
+        self.low = np.array([[crop_database[crop][param][0] for param in CROP_PARAMETERS] for crop in self.crops],
+                            dtype=np.float64)
+        self.high = np.array([[crop_database[crop][param][1] for param in CROP_PARAMETERS] for crop in self.crops],
+                             dtype=np.float64)
+        self.near = near
+        self.min_score = min_score
+        self.default = default
+        self.max_points = 2 * len(CROP_PARAMETERS)
+
+    def scores(self, readings):
+        """(n x crops) score matrix in percent"""
+        values = np.asarray(readings, dtype=np.float64).reshape(-1, len(CROP_PARAMETERS))
+        points = np.zeros((len(values), len(self.crops)), dtype=np.int8)
+        # One (n x crops) pass per parameter keeps the temporaries small
+        for column in range(len(CROP_PARAMETERS)):
+            value = values[:, column:column + 1]
+            # Within near of a bound, or inside, is the same as inside the widened range
+            points += (value >= self.low[:, column]) & (value <= self.high[:, column])
+            points += (value >= self.low[:, column] - self.near) & (value <= self.high[:, column] + self.near)
+        return points * (100.0 / self.max_points)
+
+    def recommend(self, readings):
+        """
+        (best crop names, best scores, score matrix). Readings whose best score
+        is below min_score get the default crop; ties go to the first crop in
+        database order.
+        """
+        scores = self.scores(readings)
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(scores)), best]
+        names = np.where(best_scores >= self.min_score, self.crops[best], self.default)
+        return names, best_scores, scores
@@ -0,0 +1,255 @@
+# Hapag Farm - Incremental Firebase Sync
+import json
+import os
+import random
+import threading
+from upstream_client import upstream
+
+
+class FirebaseCursorSync:
+    """
+    Fetches only the Firebase entries added since the last sync.
+
+    Entries are requested in key order with orderBy="$key"&startAt=<last key>,
+    paged with limitToFirst, so each sync transfers and parses only the new
+    readings instead of the whole node. The last synced key is optionally
+    persisted to cursor_path so restarts resume where they left off.
+    """
+
+    def __init__(self, base_url, node, cursor_path=None, page_size=500, timeout=None):
+        self.url = f"{base_url}{node}"
+        self.cursor_path = cursor_path
+        self.page_size = page_size
+        self.timeout = timeout
+        self.cursor = self._load_cursor()
+        self._lock = threading.Lock()
+
+    def _load_cursor(self):
+        if self.cursor_path and os.path.exists(self.cursor_path):
+            try:
+                with open(self.cursor_path) as f:
+                    return json.load(f).get('last_key')
+            except (OSError, ValueError):
+                pass
+        return None
+
+    def _save_cursor(self):
+        if not self.cursor_path:
+            return
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'last_key': self.cursor}, f)
+        os.replace(tmp_path, self.cursor_path)
+
+    def _get(self, params):
+        return upstream.get(self.url, params=params, timeout=self.timeout)
+
+    def fetch_page(self, cursor):
+        """Return the entries after cursor (exclusive), up to page_size, sorted by key"""
+        params = {'orderBy': '"$key"', 'limitToFirst': self.page_size}
+        if cursor is not None:
+            # startAt is inclusive, so ask for one extra entry and drop the cursor itself
+            params['startAt'] = json.dumps(cursor)
+            params['limitToFirst'] = self.page_size + 1
+        response = self._get(params)
+        response.raise_for_status()
+        page = response.json() or {}
+        return [(key, page[key]) for key in sorted(page) if key != cursor]
+
+    def fetch_new(self):
+        """
+        Fetch every entry newer than the cursor; returns ({key: entry}, new
+        cursor). The cursor itself does not move: call advance() with the new
+        cursor once the entries have been stored, so a failed write is
+        fetched again by the next sync.
+        """
+        with self._lock:
+            new_entries = {}
+            cursor = self.cursor
+            while True:
+                page = self.fetch_page(cursor)
+                if not page:
+                    break
+                new_entries.update(page)
+                cursor = page[-1][0]
+                if len(page) < self.page_size:
+                    break
+            return new_entries, cursor
+
+    def advance(self, key):
+        """Move the cursor forward to key once the entries up to it are stored"""
+        with self._lock:
+            if key is not None and (self.cursor is None or key > self.cursor):
+                self.cursor = key
+                self._save_cursor()
+
+    def sync(self, store):
+        """
+        Fetch new entries into store (anything with insert_records({key: entry}),
+        e.g. a ReadingDB) and advance the cursor once they are written.
+        Returns the number of rows written.
+        """
+        entries, cursor = self.fetch_new()
+        written = store.insert_records(entries)
+        self.advance(cursor)
+        return written
+
+
+def iter_stream_lines(response):
+    """Split a streaming response into lines as soon as each chunk arrives"""
+    buffer = ''
+    for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode('utf-8')
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            yield line.rstrip('\r')
+    if buffer:
+        yield buffer.rstrip('\r')
+
+
+def iter_sse_events(lines):
+    """Yield (event, data) pairs from an iterable of text/event-stream lines"""
+    event, data = None, []
+    for line in lines:
+        if line is None:
+            continue
+        if not line:
+            if event or data:
+                yield event or 'message', '\n'.join(data)
+            event, data = None, []
+        elif line.startswith(':'):
+            continue
+        else:
+            field, _, value = line.partition(':')
+            value = value[1:] if value.startswith(' ') else value
+            if field == 'event':
+                event = value
+            elif field == 'data':
+                data.append(value)
+
+
+class FirebaseStreamListener:
+    """
+    Push-based ingestion from the Firebase RTDB REST event stream.
+
+    Opens GET <node> with Accept: text/event-stream and applies put/patch
+    events to an in-memory {key: entry} history. Every event that touches
+    entries calls on_entries({key: entry}) with the affected entries. Dropped
+    connections are retried with exponential backoff and jitter.
+
+    params: dict, or callable returning a dict, of query parameters for each
+    (re)connect, e.g. to resume from the last synced key.
+    """
+
+    def __init__(self, base_url, node, on_entries, params=None,
+                 min_backoff=1.0, max_backoff=60.0, connect_timeout=5, read_timeout=90):
+        self.url = f"{base_url}{node}"
+        self.on_entries = on_entries
+        self.params = params
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connect_timeout = connect_timeout
+        # Firebase sends keep-alive events every 30 seconds
+        self.read_timeout = read_timeout
+        self.entries = {}
+        self.connected = False
+        self.reconnects = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='firebase-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Ask the listener to exit; it notices on the next event or read timeout"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        backoff = self.min_backoff
+        while not self._stop.is_set():
+            try:
+                if self._listen():
+                    backoff = self.min_backoff
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"Firebase stream error: {e}")
+            self.connected = False
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            self._stop.wait(backoff * random.uniform(0.5, 1.0))
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _listen(self):
+        """Consume one connection; returns True if any event was received"""
+        params = self.params() if callable(self.params) else self.params
+        received = False
+        # The listener has its own reconnect backoff, so the client does not retry
+        with upstream.get(self.url, params=params, headers={'Accept': 'text/event-stream'}, stream=True,
+                          timeout=(self.connect_timeout, self.read_timeout), retries=0) as response:
+            response.raise_for_status()
+            self.connected = True
+            for event, data in iter_sse_events(iter_stream_lines(response)):
+                if self._stop.is_set():
+                    break
+                received = True
+                if event in ('put', 'patch'):
+                    changed = self.apply_event(event, json.loads(data))
+                    if changed:
+                        self.on_entries(changed)
+                elif event in ('cancel', 'auth_revoked'):
+                    print(f"Firebase stream {event}: {data}")
+                    break
+        return received
+
+    def apply_event(self, event, payload):
+        """Apply one put/patch payload to the history; returns the changed entries"""
+        parts = [part for part in payload.get('path', '/').split('/') if part]
+        data = payload.get('data')
+        changed = {}
+
+        if not parts:
+            if not isinstance(data, dict):
+                return changed
+            for key, entry in data.items():
+                if isinstance(entry, dict):
+                    self.entries[key] = entry
+                    changed[key] = entry
+                elif entry is None:
+                    self.entries.pop(key, None)
+            return changed
+
+        key = parts[0]
+        if len(parts) == 1:
+            if data is None:
+                self.entries.pop(key, None)
+                return changed
+            if event == 'patch':
+                self.entries.setdefault(key, {}).update(data)
+            elif isinstance(data, dict):
+                self.entries[key] = data
+            else:
+                return changed
+        else:
+            entry = self.entries.setdefault(key, {})
+            if data is None:
+                entry.pop(parts[1], None)
+            elif len(parts) == 2 and event == 'put':
+                entry[parts[1]] = data
+            elif len(parts) == 2 and isinstance(data, dict):
+                entry.setdefault(parts[1], {}).update(data)
+            else:
+                return changed
+        changed[key] = self.entries[key]
+        return changed
@@ -26,7 +26,8 @@ class SensorForecaster:
         if len(historical_data) < 3:
             return None
         
-        values = np.array(historical_data[-self.history_window:])
+        # Slicing a NumPy array (e.g. a ring buffer window) is a view, not a copy
+        values = np.asarray(historical_data[-self.history_window:], dtype=float)
         
         # Try ML model first
         if self.models and sensor_name in self.models:
@@ -82,9 +83,18 @@ class SensorForecaster:
         future_x = len(values) + (hours_ahead / 24)
         return slope * future_x + intercept
 
+_forecaster = None
+
+def get_forecaster():
+    """Shared forecaster, so the model file is loaded once rather than on every call"""
+    global _forecaster
+    if _forecaster is None:
+        _forecaster = SensorForecaster()
+    return _forecaster
+
 def generate_forecasts(sensor_history):
     """Generate forecasts for all sensors"""
-    forecaster = SensorForecaster()
+    forecaster = get_forecaster()
     forecasts = {}
     
     for sensor, readings in sensor_history.items():
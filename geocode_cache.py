@@ -0,0 +1,119 @@
+# Hapag Farm - Persistent Reverse-Geocode Cache
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    name TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (lat, lon)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rate_limit (name TEXT PRIMARY KEY, last_request REAL NOT NULL);
+"""
+
+
+class GeocodeCache:
+    """
+    Reverse-geocoded place names keyed by coordinates rounded to precision
+    decimals (3 is about 100 m), persisted in SQLite so they survive restarts
+    and are shared by every worker using the same file.
+
+    Hits are served from an in-process dict after the first read. Misses
+    call lookup(lat, lon) at most once per min_interval seconds across all
+    workers (Nominatim allows one request per second), waiting up to
+    max_wait seconds for a free slot. A miss that still finds no slot, or a
+    failed lookup (None), returns None and is not cached.
+    """
+
+    def __init__(self, path, lookup, precision=3, min_interval=1.0, max_wait=5.0):
+        self.path = path
+        self.lookup = lookup
+        self.precision = precision
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._memory = {}
+        self._local = threading.local()
+        self._lookup_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        self.hits = 0
+        self.lookups = 0
+        self.rate_limited = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def key(self, lat, lon):
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def _cached(self, key):
+        name = self._memory.get(key)
+        if name is None:
+            row = self._connection().execute('SELECT name FROM places WHERE lat = ? AND lon = ?', key).fetchone()
+            if row:
+                name = self._memory[key] = row[0]
+        return name
+
+    def get(self, lat, lon):
+        key = self.key(lat, lon)
+        name = self._cached(key)
+        if name is not None:
+            self.hits += 1
+            return name
+
+        deadline = time.time() + self.max_wait
+        with self._lookup_lock:
+            while True:
+                # Another thread or worker may have looked it up while this one waited
+                name = self._cached(key)
+                if name is not None:
+                    self.hits += 1
+                    return name
+                wait = self._acquire_slot()
+                if not wait:
+                    break
+                if time.time() + wait > deadline:
+                    self.rate_limited += 1
+                    return None
+                time.sleep(wait)
+            self.lookups += 1
+            name = self.lookup(*key)
+            if name is not None:
+                self._connection().execute(
+                    'INSERT OR REPLACE INTO places (lat, lon, name, fetched_at) VALUES (?, ?, ?, ?)',
+                    key + (name, time.time()))
+                self._memory[key] = name
+            return name
+
+    def _acquire_slot(self):
+        """Claim the next upstream request slot: 0 once claimed, else seconds until it frees up"""
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute("SELECT last_request FROM rate_limit WHERE name = 'lookup'").fetchone()
+            if row and now - row[0] < self.min_interval:
+                connection.execute('ROLLBACK')
+                return row[0] + self.min_interval - now
+            connection.execute("INSERT OR REPLACE INTO rate_limit (name, last_request) VALUES ('lookup', ?)", (now,))
+            connection.execute('COMMIT')
+            return 0
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        return {'cached': len(self._memory), 'hits': self.hits, 'lookups': self.lookups,
+                'rate_limited': self.rate_limited}
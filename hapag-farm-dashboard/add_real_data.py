@@ -1,5 +1,8 @@
-import requests
+import os
 from datetime import datetime
+import pandas as pd
+import wire_format
+from upstream_client import upstream
 
 # Your device readings - CHANGE THESE VALUES
 device_data = {
@@ -12,14 +15,38 @@ device_data = {
     "timestamp": datetime.now().isoformat()
 }
 
-# Add to Firebase
-url = "https://hapagfarm-default-rtdb.asia-southeast1.firebasedatabase.app/sensor_logs.json"
-timestamp_key = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+# Set HAPAG_API_URL (e.g. http://localhost:5000) to upload to the Flask app in the
+# compact binary format instead of writing to Firebase
+API_URL = os.environ.get("HAPAG_API_URL")
+INGEST_TOKEN = os.environ.get("INGEST_TOKEN")
 
-try:
-    # Add new reading with timestamp as key
-    response = requests.patch(f"{url}", json={timestamp_key: device_data})
-    print(f"✅ Data added! Status: {response.status_code}")
-    print(f"📊 Added: N={device_data['N']}, P={device_data['P']}, K={device_data['K']}, pH={device_data['ph']}")
-except Exception as e:
-    print(f"❌ Error: {e}")
\ No newline at end of file
+
+def pack_readings(readings):
+    """Encode reading dicts as one wire_format batch (sensors missing from a reading are sent as NaN)"""
+    frame = pd.DataFrame(readings)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    return wire_format.encode(frame)
+
+
+if API_URL:
+    payload = pack_readings([device_data])
+    headers = {"Content-Type": wire_format.CONTENT_TYPE}
+    if INGEST_TOKEN:
+        headers["Authorization"] = f"Bearer {INGEST_TOKEN}"
+    try:
+        response = upstream.request("POST", f"{API_URL}/api/readings", data=payload, headers=headers)
+        print(f"✅ Data uploaded! Status: {response.status_code} ({len(payload)} bytes) {response.text.strip()}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+else:
+    # Add to Firebase
+    url = "https://hapagfarm-default-rtdb.asia-southeast1.firebasedatabase.app/sensor_logs.json"
+    timestamp_key = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+    try:
+        # Add new reading with timestamp as key
+        response = upstream.request("PATCH", url, json={timestamp_key: device_data})
+        print(f"✅ Data added! Status: {response.status_code}")
+        print(f"📊 Added: N={device_data['N']}, P={device_data['P']}, K={device_data['K']}, pH={device_data['ph']}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
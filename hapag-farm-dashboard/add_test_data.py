@@ -1,6 +1,6 @@
-import requests
 import json
 from datetime import datetime
+from upstream_client import upstream
 
 # Test data
 test_data = {
@@ -24,7 +24,7 @@ test_data = {
 url = "https://hapagfarm-default-rtdb.asia-southeast1.firebasedatabase.app/sensor_logs.json"
 
 try:
-    response = requests.put(url, json=test_data)
+    response = upstream.request("PUT", url, json=test_data)
     print(f"Status: {response.status_code}")
     print("Test data added to Firebase!")
 except Exception as e:
@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import requests
 import joblib
+from firebase_history import FirebaseHistory
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
@@ -23,6 +24,8 @@ st.set_page_config(
 # =========================================================
 FIREBASE_URL = "https://hapagfarm-default-rtdb.asia-southeast1.firebasedatabase.app"
 FIREBASE_NODE = "/sensor_logs.json"
+# Newest readings loaded for the history charts
+HISTORY_ROWS = 500
 
 # =========================================================
 # CUSTOM CSS STYLING
@@ -155,22 +158,25 @@ def get_expert_recommendation(n, p, k, ph, hum):
 # =========================================================
 # DATA FUNCTIONS
 # =========================================================
+@st.cache_resource
+def get_firebase_history():
+    return FirebaseHistory(FIREBASE_URL, FIREBASE_NODE)
+
 @st.cache_data(ttl=30)
-def fetch_firebase_data():
+def sync_firebase_history():
     try:
-        response = requests.get(f"{FIREBASE_URL}{FIREBASE_NODE}")
-        if response.status_code == 200:
-            return response.json()
-        return None
+        return get_firebase_history().sync()
     except Exception:
         return None
 
+def fetch_firebase_data():
+    sync_firebase_history()
+    history = get_firebase_history().latest(HISTORY_ROWS)
+    return None if history.empty else history
+
 def get_latest_reading():
-    data = fetch_firebase_data()
-    if data:
-        latest_key = max(data.keys())
-        return data[latest_key], latest_key
-    return None, None
+    sync_firebase_history()
+    return get_firebase_history().latest_reading()
 
 # =========================================================
 # UI COMPONENTS
@@ -247,7 +253,7 @@ with st.sidebar:
     
     # Connection Status
     data = fetch_firebase_data()
-    if data:
+    if data is not None:
         render_status_banner("success", "Database Connected", "🔗")
     else:
         render_status_banner("warning", "Database Offline", "📡")
@@ -317,10 +323,8 @@ elif tab_selection == "📊 Analytics":
     st.markdown("### 📈 Historical Data Analysis")
     
     data = fetch_firebase_data()
-    if data:
-        df = pd.DataFrame.from_dict(data, orient='index')
-        df.index = pd.to_datetime(df.index, errors='coerce')
-        df = df.dropna().sort_index()
+    if data is not None:
+        df = data
         
         if not df.empty:
             fig = go.Figure()
@@ -434,9 +438,9 @@ elif tab_selection == "⚙️ Settings":
     
     if st.button("🔄 Test Connection"):
         data = fetch_firebase_data()
-        if data:
+        if data is not None:
             st.success("✅ Successfully connected to Firebase database")
-            st.info(f"Found {len(data)} sensor readings")
+            st.info(f"Found {get_firebase_history().count()} sensor readings")
         else:
             st.error("❌ Unable to connect to Firebase database")
 
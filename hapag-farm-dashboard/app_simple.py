@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import requests
 import joblib
+from firebase_history import FirebaseHistory
 
 # Page config MUST be first
 st.set_page_config(page_title="Hapag Farm", page_icon="🌾", layout="wide")
@@ -10,6 +11,8 @@ st.set_page_config(page_title="Hapag Farm", page_icon="🌾", layout="wide")
 # Configuration
 FIREBASE_URL = "https://hapagfarm-default-rtdb.asia-southeast1.firebasedatabase.app"
 FIREBASE_NODE = "/sensor_logs.json"
+# Newest readings loaded for the history charts
+HISTORY_ROWS = 500
 
 # Load ML models
 @st.cache_resource
@@ -35,16 +38,23 @@ def get_expert_recommendation(n, p, k, ph, hum):
         return "Tomatoes (Balanced conditions)"
 
 # Fetch data
+@st.cache_resource
+def get_firebase_history():
+    return FirebaseHistory(FIREBASE_URL, FIREBASE_NODE)
+
 @st.cache_data(ttl=30)
-def fetch_data():
+def sync_history():
     try:
-        response = requests.get(f"{FIREBASE_URL}{FIREBASE_NODE}")
-        if response.status_code == 200:
-            return response.json()
+        return get_firebase_history().sync()
     except:
         pass
     return None
 
+def fetch_data():
+    sync_history()
+    history = get_firebase_history().latest(HISTORY_ROWS)
+    return None if history.empty else history
+
 def get_latest():
     try:
         url = f"{FIREBASE_URL}{FIREBASE_NODE}?orderBy=\"$key\"&limitToLast=1"
@@ -131,8 +141,8 @@ with tab2:
     st.header("📅 Historical Data")
     
     data = fetch_data()
-    if data:
-        df = pd.DataFrame.from_dict(data, orient='index')
+    if data is not None:
+        df = data
         st.line_chart(df[['N', 'P', 'K']] if all(col in df.columns for col in ['N', 'P', 'K']) else None)
     else:
         st.warning("No historical data available")
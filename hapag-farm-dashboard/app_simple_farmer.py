@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import requests
 import joblib
+from firebase_history import FirebaseHistory
 import plotly.graph_objects as go
 from datetime import datetime
 
@@ -21,6 +22,8 @@ st.set_page_config(
 # =========================================================
 FIREBASE_URL = "https://hapagfarm-default-rtdb.asia-southeast1.firebasedatabase.app"
 FIREBASE_NODE = "/sensor_logs.json"
+# Newest readings loaded for the history charts
+HISTORY_ROWS = 500
 
 # =========================================================
 # SIMPLE CSS
@@ -109,16 +112,22 @@ def get_simple_recommendation(n, p, k, ph, hum):
     else:
         return "Tomatoes (balanced conditions)"
 
+@st.cache_resource
+def get_firebase_history():
+    return FirebaseHistory(FIREBASE_URL, FIREBASE_NODE)
+
 @st.cache_data(ttl=30)
-def fetch_firebase_data():
+def sync_firebase_history():
     try:
-        response = requests.get(f"{FIREBASE_URL}{FIREBASE_NODE}")
-        if response.status_code == 200:
-            return response.json()
-        return None
+        return get_firebase_history().sync()
     except Exception:
         return None
 
+def fetch_firebase_data():
+    sync_firebase_history()
+    history = get_firebase_history().latest(HISTORY_ROWS)
+    return None if history.empty else history
+
 def fetch_latest_data():
     try:
         url = f"{FIREBASE_URL}{FIREBASE_NODE}?orderBy=\"$key\"&limitToLast=1"
@@ -301,10 +310,8 @@ with tab2:
     st.header("📊 How Your Soil Changed Over Time")
     
     data = fetch_firebase_data()
-    if data:
-        df = pd.DataFrame.from_dict(data, orient='index')
-        df.index = pd.to_datetime(df.index, errors='coerce')
-        df = df.dropna().sort_index()
+    if data is not None:
+        df = data
         
         if not df.empty and len(df) > 1:
             # Simple chart
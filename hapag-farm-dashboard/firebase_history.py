@@ -0,0 +1,44 @@
+import os
+import threading
+from firebase_sync import FirebaseCursorSync
+from reading_db import ReadingDB
+
+
+class FirebaseHistory:
+    """
+    Local copy of a Firebase node in the Flask app's reading store.
+
+    Entries are normalized with sensor_schema.records_to_frame and written to
+    a ReadingDB (SQLite in WAL mode, indexed by (device_id, timestamp)), so
+    the dashboards query the same schema as the Flask app. Each sync pages
+    through FirebaseCursorSync from the last synced key, kept next to the
+    database, so a refresh costs as much as the new readings instead of the
+    whole history.
+    """
+
+    def __init__(self, firebase_url, firebase_node, db_path=None, page_size=500, timeout=10):
+        db_path = db_path or os.environ.get('HISTORY_DB', 'firebase_history.db')
+        self.db = ReadingDB(db_path)
+        self._cursor = FirebaseCursorSync(firebase_url, firebase_node, cursor_path=f"{db_path}.cursor.json",
+                                          page_size=page_size, timeout=timeout)
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Store entries added since the last sync; returns how many readings were written"""
+        with self._lock:
+            return self._cursor.sync(self.db)
+
+    def latest(self, n=1, device_id=None):
+        """The n newest readings indexed by timestamp, oldest first (empty when there are none)"""
+        return self.db.latest(n, device_id).set_index('timestamp')
+
+    def latest_reading(self):
+        """Newest reading as ({sensor: value}, timestamp string), or (None, None)"""
+        latest = self.latest(1)
+        if latest.empty:
+            return None, None
+        # Sensors the reading does not have are left out, so callers' defaults apply
+        return latest.iloc[-1].dropna().to_dict(), str(latest.index[-1])
+
+    def count(self):
+        return len(self.db)
@@ -18,6 +18,7 @@ echo Setup complete!
 echo.
 echo To run the dashboard:
 echo 1. Activate virtual environment: venv\Scripts\activate
-echo 2. Run Streamlit: streamlit run app.py
+echo 2. Make the repository root importable: set PYTHONPATH=..
+echo 3. Run Streamlit: streamlit run app.py
 echo.
 pause
\ No newline at end of file
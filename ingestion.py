@@ -0,0 +1,83 @@
+# Hapag Farm - Background Sensor Ingestion
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# Immutable view of the most recent upstream poll
+SensorSnapshot = namedtuple('SensorSnapshot', ['reading', 'timestamp', 'fetched_at'])
+
+EMPTY_SNAPSHOT = SensorSnapshot(None, None, 0.0)
+
+
+class IngestionWorker:
+    """
+    Polls the upstream sources on a fixed interval from a daemon thread and
+    publishes the result as an immutable SensorSnapshot. Request handlers only
+    read the published snapshot, so upstream load does not depend on how many
+    dashboards are open.
+
+    fetch_latest: callable returning (reading_dict, timestamp)
+    sync_history: optional callable run after every poll (e.g. store sync)
+    """
+
+    def __init__(self, fetch_latest, sync_history=None, interval=5.0):
+        self.fetch_latest = fetch_latest
+        self.sync_history = sync_history
+        self.interval = interval
+        self._snapshot = EMPTY_SNAPSHOT
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sensor-ingestion', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wait_for_snapshot(self, timeout=None):
+        """Block until the first poll has completed (or timeout) and return the snapshot"""
+        self._ready.wait(timeout)
+        return self._snapshot
+
+    def publish(self, reading, timestamp):
+        """Replace the published snapshot (used by push-based sources)"""
+        self._snapshot = SensorSnapshot(MappingProxyType(dict(reading)), timestamp, time.time())
+        self._ready.set()
+
+    def poll_once(self):
+        try:
+            reading, timestamp = self.fetch_latest()
+            if reading:
+                self.publish(reading, timestamp)
+        except Exception as e:
+            print(f"Ingestion error: {e}")
+        finally:
+            self._ready.set()
+
+        if self.sync_history:
+            try:
+                self.sync_history()
+            except Exception as e:
+                print(f"History sync error: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.interval)
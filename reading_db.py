@@ -0,0 +1,308 @@
+# Hapag Farm - SQLite Reading Store
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from sensor_schema import SENSOR_COLUMNS, empty_frame, records_to_frame
+from rollups import (DAY, MINUTE, ROLLUP_COLUMNS, TIERS, combine, floor, partials_to_rows, pick_tier,
+                     rows_to_partials, schema as rollup_schema, table, to_history)
+
+DEFAULT_DEVICE = 'default'
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS readings (
+    device_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    {', '.join(f'{name} REAL' for name in SENSOR_COLUMNS)},
+    PRIMARY KEY (device_id, timestamp)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS readings_timestamp ON readings (timestamp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('backfill_version', 0);
+"""
+
+COLUMNS = ', '.join(['device_id', 'timestamp'] + SENSOR_COLUMNS)
+
+
+def to_ns(value):
+    """datetime-like or int nanoseconds -> int nanoseconds (None passes through)"""
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is not None:
+        stamp = stamp.tz_convert(None)
+    return stamp.value
+
+
+class ReadingDB:
+    """
+    Embedded SQLite store for sensor readings, indexed by (device_id, timestamp).
+
+    The database runs in WAL mode, so any number of readers (threads or
+    gunicorn workers sharing the file) keep reading while one ingest writer
+    commits. Each thread gets its own connection. Timestamps are stored as
+    int64 nanoseconds; queries return frames shaped like
+    sensor_schema.normalize_frame output plus a device_id column.
+    """
+
+    def __init__(self, path, busy_timeout=5000):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        connection = self.connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA + rollup_schema())
+        self._backfill_rollups()
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, isolation_level=None)
+            connection.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+            # WAL + NORMAL: durable across application crashes, one fsync per checkpoint
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @property
+    def version(self):
+        """Incremented by every write transaction"""
+        return self.connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    @property
+    def backfill_version(self):
+        """
+        Incremented by every write with a row at or before the newest stored
+        timestamp (a late reading or a replaced one), so a cache of the newest
+        rows can tell when appending the rows after its last one is not enough
+        """
+        return self.meta('backfill_version')
+
+    @contextmanager
+    def read_snapshot(self):
+        """
+        Read transaction: every query inside it (including version) sees the
+        same committed state, however many writes land meanwhile (WAL).
+        Nested use joins the outer transaction.
+        """
+        connection = self.connection()
+        if connection.in_transaction:
+            yield
+            return
+        connection.execute('BEGIN')
+        try:
+            yield
+        finally:
+            connection.execute('COMMIT')
+
+    def meta(self, key):
+        """Integer stored under key in the meta table (e.g. an ingest cursor), or None"""
+        row = self.connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.connection().execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, int(value)))
+
+    def insert_frame(self, frame, device_id=DEFAULT_DEVICE):
+        """
+        Write a normalized history frame in one transaction. Rows are keyed by
+        (device_id, timestamp); a reading for an existing key replaces it.
+        Uses the frame's device_id column where it has a value, device_id
+        otherwise. Returns rows written.
+        """
+        if frame is None or frame.empty:
+            return 0
+        timestamps = frame['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        if 'device_id' in frame.columns:
+            devices = frame['device_id'].where(frame['device_id'].notna(), device_id).astype(str).tolist()
+        else:
+            devices = [device_id] * len(frame)
+        values = []
+        for name in SENSOR_COLUMNS:
+            column = frame[name].to_numpy(dtype=np.float64) if name in frame.columns else np.full(len(frame), np.nan)
+            # NaN -> NULL, converted per column rather than per value
+            column = column.astype(object)
+            column[np.isnan(column.astype(np.float64))] = None
+            values.append(column.tolist())
+        rows = list(zip(devices, timestamps.tolist(), *values))
+        placeholders = ', '.join('?' * (2 + len(SENSOR_COLUMNS)))
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            newest = connection.execute('SELECT MAX(timestamp) FROM readings').fetchone()[0]
+            if newest is not None and int(timestamps.min()) <= newest:
+                connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'backfill_version'")
+            connection.executemany(f'INSERT OR REPLACE INTO readings ({COLUMNS}) VALUES ({placeholders})', rows)
+            self._refresh_rollups(int(timestamps.min()), int(timestamps.max()))
+            connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return len(rows)
+
+    def insert_records(self, records, device_id=DEFAULT_DEVICE):
+        """Write a Firebase-style {key: {sensor values}} dict (see sensor_schema.records_to_frame)"""
+        return self.insert_frame(records_to_frame(records), device_id)
+
+    def _refresh_rollups(self, first, last):
+        """
+        Recompute the rollup buckets covering [first, last] (nanoseconds).
+        Minute buckets are rebuilt from the raw readings, hour buckets from
+        minute buckets and day buckets from hour buckets, so an append only
+        touches the few buckets it falls into. Runs inside the caller's transaction.
+        """
+        connection = self.connection()
+        finer = None
+        for tier, width in TIERS.items():
+            lo, hi = floor(first, width), floor(last, width) + width
+            if finer is None:
+                rows = connection.execute(f'SELECT {COLUMNS} FROM readings WHERE timestamp >= ? AND timestamp < ?',
+                                          (lo, hi)).fetchall()
+                partials = rows_to_partials(rows, ['device_id', 'timestamp'] + SENSOR_COLUMNS)
+            else:
+                partials = self._rollup_rows(finer, lo, hi)
+            placeholders = ', '.join('?' * len(ROLLUP_COLUMNS))
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {table(tier)} ({', '.join(ROLLUP_COLUMNS)}) VALUES ({placeholders})",
+                partials_to_rows(combine(partials, width)))
+            finer = tier
+
+    def _backfill_rollups(self):
+        """Build rollups for readings stored before the rollup tables existed, one day per transaction"""
+        connection = self.connection()
+        if connection.execute(f"SELECT 1 FROM {table('minute')} LIMIT 1").fetchone():
+            return
+        first, last = self.first_timestamp(), self.last_timestamp()
+        if first is None:
+            return
+        for day in range(floor(first, DAY), last + 1, DAY):
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._refresh_rollups(day, day + DAY - 1)
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+    def _rollup_rows(self, tier, start=None, end=None, device_id=None):
+        clauses, params = [], []
+        for clause, value in (('device_id = ?', device_id), ('bucket >= ?', start), ('bucket < ?', end)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self.connection().execute(
+            f"SELECT {', '.join(ROLLUP_COLUMNS)} FROM {table(tier)} {where} ORDER BY bucket", params).fetchall()
+        return rows_to_partials(rows)
+
+    def rollup(self, tier, start=None, end=None, device_id=None):
+        """
+        Bucketed history for a tier ('minute', 'hour' or 'day') as a frame of
+        per-sensor means plus _min/_max/_count/_last columns (see
+        rollups.to_history). Buckets of different devices are merged unless
+        device_id is given.
+        """
+        width = TIERS[tier]
+        start = floor(to_ns(start), width) if start is not None else None
+        rows = self._rollup_rows(tier, start, to_ns(end), device_id)
+        if device_id is None and len(set(rows['device_id'])) > 1:
+            rows = combine(rows, width, by_device=False)
+        return to_history(rows)
+
+    def history(self, start=None, end=None, max_points=1000, device_id=None):
+        """
+        History for [start, end) in at most about max_points rows: raw readings
+        when they fit, otherwise the finest rollup tier that does.
+        Returns (frame, tier, version) where tier is 'raw', 'minute', 'hour'
+        or 'day' and version the DB version the frame was read at.
+        """
+        with self.read_snapshot():
+            frame, tier = self._history(start, end, max_points, device_id)
+            return frame, tier, self.version
+
+    def _history(self, start, end, max_points, device_id):
+        first, last = self.first_timestamp(), self.last_timestamp()
+        if first is None:
+            return self.range(start, end, device_id), 'raw'
+        lo = max(to_ns(start), first) if start is not None else first
+        hi = min(to_ns(end), last + 1) if end is not None else last + 1
+        span = max(hi - lo, 0)
+        if span / MINUTE <= max_points:
+            # Short window: raw rows are cheap to count through the timestamp index
+            count = self.connection().execute('SELECT COUNT(*) FROM readings WHERE timestamp >= ? AND timestamp < ?',
+                                              (lo, hi)).fetchone()[0]
+            if count <= max_points:
+                return self.range(start, end, device_id), 'raw'
+        tier = pick_tier(span, max_points)
+        return self.rollup(tier, start, end, device_id), tier
+
+    def _query(self, sql, params=()):
+        rows = self.connection().execute(sql, params).fetchall()
+        if not rows:
+            frame = empty_frame()
+            frame.insert(0, 'device_id', pd.Series([], dtype=object))
+            return frame
+        frame = pd.DataFrame.from_records(rows, columns=['device_id', 'timestamp'] + SENSOR_COLUMNS)
+        frame['timestamp'] = frame['timestamp'].to_numpy(dtype=np.int64).view('datetime64[ns]')
+        for name in SENSOR_COLUMNS:
+            frame[name] = frame[name].astype(np.float32)
+        return frame
+
+    def range(self, start=None, end=None, device_id=None):
+        """Readings with start <= timestamp < end (either bound optional), oldest first"""
+        clauses, params = [], []
+        if device_id is not None:
+            clauses.append('device_id = ?')
+            params.append(device_id)
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            params.append(to_ns(start))
+        if end is not None:
+            clauses.append('timestamp < ?')
+            params.append(to_ns(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._query(f'SELECT {COLUMNS} FROM readings {where} ORDER BY timestamp', params)
+
+    def latest(self, n=1, device_id=None, after=None):
+        """The n most recent readings (of those newer than after, when given), oldest first"""
+        clauses, params = [], []
+        if device_id is not None:
+            clauses.append('device_id = ?')
+            params.append(device_id)
+        if after is not None:
+            clauses.append('timestamp > ?')
+            params.append(to_ns(after))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        frame = self._query(f'SELECT {COLUMNS} FROM readings {where} ORDER BY timestamp DESC LIMIT ?',
+                            params + [int(n)])
+        return frame.iloc[::-1].reset_index(drop=True)
+
+    def latest_per_device(self):
+        """Most recent reading of every device"""
+        # SQLite takes bare columns from the row that supplied MAX()
+        sensors = ', '.join(SENSOR_COLUMNS)
+        return self._query(f'SELECT device_id, MAX(timestamp), {sensors} FROM readings '
+                           'GROUP BY device_id ORDER BY device_id')
+
+    def first_timestamp(self):
+        # A lone MIN()/MAX() is answered from the timestamp index; both in one query scan the table
+        return self.connection().execute('SELECT MIN(timestamp) FROM readings').fetchone()[0]
+
+    def last_timestamp(self, device_id=None):
+        """Newest timestamp in nanoseconds, or None when empty"""
+        if device_id is None:
+            row = self.connection().execute('SELECT MAX(timestamp) FROM readings').fetchone()
+        else:
+            row = self.connection().execute('SELECT MAX(timestamp) FROM readings WHERE device_id = ?',
+                                            (device_id,)).fetchone()
+        return row[0]
+
+    def __len__(self):
+        return self.connection().execute('SELECT COUNT(*) FROM readings').fetchone()[0]
@@ -0,0 +1,99 @@
+# Hapag Farm - Recent Reading Ring Buffers
+import threading
+import numpy as np
+from sensor_schema import SENSOR_COLUMNS
+
+
+class RingBuffer:
+    """
+    Fixed-capacity ring of the most recent values.
+
+    Each value is written twice, at i and i + capacity, so the newest n
+    values are always one contiguous slice: appends are O(1) and window()
+    returns a view without copying.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._data[self._next + self.capacity] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)[-self.capacity:]
+        start = 0
+        while start < len(values):
+            # Split at the wrap point so each part is one slice assignment
+            count = min(len(values) - start, self.capacity - self._next)
+            part = values[start:start + count]
+            self._data[self._next:self._next + count] = part
+            self._data[self._next + self.capacity:self._next + self.capacity + count] = part
+            self._next = (self._next + count) % self.capacity
+            self._size = min(self._size + count, self.capacity)
+            start += count
+
+    def window(self, n=None):
+        """
+        Newest n values (all held values when n is None), oldest first, as a
+        read-only view; use it before further appends, which overwrite the
+        oldest slots.
+        """
+        n = self._size if n is None else min(n, self._size)
+        end = self._next + self.capacity
+        view = self._data[end - n:end]
+        view.flags.writeable = False
+        return view
+
+
+class SensorRingBuffers:
+    """
+    Most recent readings per sensor with their timestamps (int64 ns). A
+    sensor's ring only receives readings where that sensor has a value, so
+    windows never contain gaps. Readings not newer than the last one held
+    are ignored.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._values = {name: RingBuffer(capacity) for name in SENSOR_COLUMNS}
+        self._timestamps = {name: RingBuffer(capacity, np.int64) for name in SENSOR_COLUMNS}
+        self._last = None
+        self._lock = threading.Lock()
+
+    def last_timestamp(self):
+        return self._last
+
+    def append_frame(self, frame):
+        """Append a normalized frame's readings newer than the last one held; returns rows appended"""
+        if frame is None or frame.empty:
+            return 0
+        timestamps = frame['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        with self._lock:
+            newer = timestamps > self._last if self._last is not None else np.ones(len(timestamps), dtype=bool)
+            if not newer.any():
+                return 0
+            for name in SENSOR_COLUMNS:
+                values = frame[name].to_numpy(dtype=np.float64)
+                present = newer & ~np.isnan(values)
+                self._values[name].extend(values[present])
+                self._timestamps[name].extend(timestamps[present])
+            self._last = int(timestamps[newer].max())
+            return int(newer.sum())
+
+    def window(self, name, n=None):
+        """
+        (timestamps, values) of the newest n readings of one sensor, as
+        read-only views; they stay intact until capacity - n more readings of
+        that sensor are appended
+        """
+        with self._lock:
+            return self._timestamps[name].window(n), self._values[name].window(n)
@@ -0,0 +1,127 @@
+# Hapag Farm - Reading Rollup Tiers
+import numpy as np
+import pandas as pd
+from sensor_schema import SENSOR_COLUMNS
+
+MINUTE = 60 * 10**9
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Tier name -> bucket width in nanoseconds, finest first; each tier is built from the one before it
+TIERS = {'minute': MINUTE, 'hour': HOUR, 'day': DAY}
+STATS = ('min', 'max', 'sum', 'count', 'last')
+ROLLUP_COLUMNS = ['device_id', 'bucket', 'readings'] + [f'{name}_{stat}' for name in SENSOR_COLUMNS for stat in STATS]
+
+
+def table(tier):
+    return f'rollup_{tier}'
+
+
+def schema():
+    sensors = ', '.join(f'{column} REAL' for column in ROLLUP_COLUMNS[3:])
+    return ''.join(
+        f"CREATE TABLE IF NOT EXISTS {table(tier)} ("
+        f"device_id TEXT NOT NULL, bucket INTEGER NOT NULL, readings INTEGER NOT NULL, {sensors}, "
+        f"PRIMARY KEY (device_id, bucket)) WITHOUT ROWID;\n"
+        f"CREATE INDEX IF NOT EXISTS {table(tier)}_bucket ON {table(tier)} (bucket);\n"
+        for tier in TIERS)
+
+
+def floor(timestamp, width):
+    return timestamp - timestamp % width
+
+
+def rows_to_partials(rows, columns=None):
+    """
+    SQLite result rows as partial aggregates: a dict of numpy arrays keyed by
+    ROLLUP_COLUMNS (NULL becomes NaN). With columns=['device_id',
+    'timestamp', *SENSOR_COLUMNS] the rows are raw readings, each turned into
+    a single-reading partial.
+    """
+    columns = columns or ROLLUP_COLUMNS
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    arrays = {}
+    for name, column in zip(columns, values):
+        if name == 'device_id':
+            arrays[name] = np.array(column, dtype=object)
+        elif name in ('bucket', 'timestamp', 'readings'):
+            arrays[name] = np.array(column, dtype=np.int64)
+        else:
+            arrays[name] = np.array(column, dtype=np.float64)
+    if 'timestamp' not in arrays:
+        return arrays
+    partials = {'device_id': arrays['device_id'], 'bucket': arrays['timestamp'],
+                'readings': np.ones(len(arrays['timestamp']), dtype=np.int64)}
+    for name in SENSOR_COLUMNS:
+        sensor = arrays[name]
+        present = ~np.isnan(sensor)
+        partials.update({f'{name}_min': sensor, f'{name}_max': sensor, f'{name}_sum': np.where(present, sensor, 0.0),
+                         f'{name}_count': present.astype(np.float64), f'{name}_last': sensor})
+    return partials
+
+
+def combine(partials, width, by_device=True):
+    """
+    Merge partial aggregates (raw readings or finer buckets) into buckets of
+    the given width with numpy reductions over the sorted groups. 'last' is
+    the newest non-null value in the bucket.
+    """
+    buckets = floor(partials['bucket'], width)
+    if by_device:
+        devices, device_codes = np.unique(partials['device_id'].astype(str), return_inverse=True)
+    else:
+        devices, device_codes = np.array([None], dtype=object), np.zeros(len(buckets), dtype=np.int64)
+    order = np.lexsort((partials['bucket'], buckets, device_codes))
+    buckets, device_codes = buckets[order], device_codes[order]
+    if not len(order):
+        return {name: partials[name][:0] for name in ROLLUP_COLUMNS}
+
+    starts = np.flatnonzero(np.r_[True, (buckets[1:] != buckets[:-1]) | (device_codes[1:] != device_codes[:-1])])
+    positions = np.arange(len(order))
+    combined = {'device_id': devices[device_codes[starts]], 'bucket': buckets[starts],
+                'readings': np.add.reduceat(partials['readings'][order], starts)}
+    for name in SENSOR_COLUMNS:
+        # fmin/fmax skip NaN unless the whole group is NaN
+        combined[f'{name}_min'] = np.fmin.reduceat(partials[f'{name}_min'][order], starts)
+        combined[f'{name}_max'] = np.fmax.reduceat(partials[f'{name}_max'][order], starts)
+        combined[f'{name}_sum'] = np.add.reduceat(partials[f'{name}_sum'][order], starts)
+        combined[f'{name}_count'] = np.add.reduceat(partials[f'{name}_count'][order], starts)
+        last = partials[f'{name}_last'][order]
+        newest = np.maximum.reduceat(np.where(np.isnan(last), -1, positions), starts)
+        combined[f'{name}_last'] = np.where(newest >= 0, last[np.maximum(newest, 0)], np.nan)
+    return combined
+
+
+def partials_to_rows(partials):
+    """Partial aggregates as SQLite parameter tuples (NaN becomes NULL)"""
+    columns = [partials[name].tolist() for name in ROLLUP_COLUMNS]
+    return [tuple(None if value != value else value for value in row) for row in zip(*columns)]
+
+
+def to_history(rollup):
+    """
+    Rollup partials as a history frame: a timestamp column (bucket start) and
+    a mean column per sensor, next to the per-sensor _min/_max/_count/_last.
+    """
+    history = pd.DataFrame({'timestamp': rollup['bucket'].astype(np.int64).view('datetime64[ns]')})
+    for name in SENSOR_COLUMNS:
+        counts = rollup[f'{name}_count']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            history[name] = np.where(counts > 0, rollup[f'{name}_sum'] / counts, np.nan)
+        for stat in ('min', 'max', 'count', 'last'):
+            history[f'{name}_{stat}'] = rollup[f'{name}_{stat}']
+    history['readings'] = rollup['readings']
+    return history
+
+
+def pick_tier(span, max_points):
+    """
+    Tier to draw a window of span nanoseconds from: the first (finest) tier
+    that needs no more than max_points buckets, i.e. the coarsening is only
+    as coarse as the window requires. Falls back to days.
+    """
+    for tier, width in TIERS.items():
+        if span / width <= max_points:
+            return tier
+    return 'day'
+
@@ -0,0 +1,72 @@
+# Hapag Farm - Parsed Sensor History Window
+import numpy as np
+from sensor_schema import SENSOR_COLUMNS
+
+
+class SensorFrame:
+    """
+    One history window, converted once: sorted datetime64 timestamps and a
+    float64 array per sensor (NaN where missing). Built from a raw or rollup
+    history frame (see ReadingDB.history) and shared by the chart, trend and
+    summary code, so none of them re-parse the data.
+
+    counts holds readings per row and per sensor: 1/0 for raw readings, the
+    bucket counts for rollups, so means stay weighted by readings. version is
+    the reading DB version the history was read at.
+    """
+
+    __slots__ = ('timestamps', 'values', 'counts', 'readings', 'tier', 'version')
+
+    def __init__(self, timestamps, values, counts, readings, tier='raw', version=None):
+        self.timestamps = timestamps
+        self.values = values
+        self.counts = counts
+        self.readings = readings
+        self.tier = tier
+        self.version = version
+
+    @classmethod
+    def from_history(cls, history, tier='raw', version=None):
+        """Single vectorized pass over a history frame sorted by timestamp"""
+        timestamps = history['timestamp'].to_numpy(dtype='datetime64[ns]')
+        values, counts = {}, {}
+        for name in SENSOR_COLUMNS:
+            column = history[name].to_numpy(dtype=np.float64)
+            values[name] = column
+            if f'{name}_count' in history.columns:
+                counts[name] = history[f'{name}_count'].to_numpy(dtype=np.float64)
+            else:
+                counts[name] = (~np.isnan(column)).astype(np.float64)
+        if 'readings' in history.columns:
+            readings = history['readings'].to_numpy(dtype=np.int64)
+        else:
+            readings = np.ones(len(timestamps), dtype=np.int64)
+        return cls(timestamps, values, counts, readings, tier, version)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def empty(self):
+        return not len(self.timestamps)
+
+    def total_readings(self):
+        return int(self.readings.sum())
+
+    def mean(self, name):
+        """Reading-weighted mean of a sensor over the window (NaN when it has no values)"""
+        counts = self.counts[name]
+        total = counts.sum()
+        if not total:
+            return np.nan
+        return float(np.nansum(self.values[name] * counts) / total)
+
+    def edge_mean(self, name, rows, newest=True):
+        """Mean of the sensor over the first or last few rows (NaN-skipping)"""
+        column = self.values[name]
+        window = column[-rows:] if newest else column[:rows]
+        window = window[~np.isnan(window)]
+        return float(window.mean()) if len(window) else np.nan
+
+    def summary(self):
+        return {'readings': self.total_readings(), **{name: self.mean(name) for name in SENSOR_COLUMNS}}
@@ -0,0 +1,285 @@
+# Hapag Farm - Sensor Column Mapping
+import io
+import json
+import threading
+import numpy as np
+import pandas as pd
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+import wire_format
+
+SENSOR_COLUMNS = ['N', 'P', 'K', 'ph', 'humidity', 'temperature', 'ec']
+
+# Source column names for each canonical column, in order of preference
+COLUMN_ALIASES = {
+    'timestamp': ('Timestamp', 'timestamp', 'date'),
+    'N': ('N (ppm)', 'N', 'nitrogen'),
+    'P': ('P (ppm)', 'P', 'phosphorus'),
+    'K': ('K (ppm)', 'K', 'potassium'),
+    'ph': ('pH', 'ph'),
+    'humidity': ('Humidity', 'humidity', 'moisture'),
+    'temperature': ('Temp', 'Temperature', 'temperature'),
+    'ec': ('EC', 'ec'),
+}
+
+# Source column names of the reporting device, in order of preference
+DEVICE_ALIASES = ('device_id', 'device', 'Device')
+
+# Accepted value ranges (inclusive), for ingested readings and crop model inputs
+SENSOR_BOUNDS = {
+    'N': (0, 1000),
+    'P': (0, 1000),
+    'K': (0, 1000),
+    'ph': (0, 14),
+    'humidity': (0, 100),
+}
+
+
+class AliasMapper:
+    """
+    Compiled alias -> canonical field mapping.
+
+    For a given set of source keys, which aliases are present (in preference
+    order) is resolved once and cached. Mapping a table, or every further
+    record with the same keys, reuses that plan instead of probing each
+    alias with chained .get calls.
+    """
+
+    def __init__(self, aliases, max_plans=256):
+        self.aliases = aliases
+        self.max_plans = max_plans
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def plan(self, keys):
+        """{field: [present source keys, most preferred first]} for these source keys"""
+        keys = tuple(keys)
+        plan = self._plans.get(keys)
+        if plan is None:
+            present = set(keys)
+            plan = {field: [alias for alias in aliases if alias in present] for field, aliases in self.aliases.items()}
+            with self._lock:
+                if len(self._plans) >= self.max_plans:
+                    self._plans.clear()
+                self._plans[keys] = plan
+        return plan
+
+    def reading(self, record, default=0.0, timestamp=None):
+        """
+        Map one raw record (dict or pandas Series) to a canonical reading dict:
+        each sensor as a float (default when missing or not numeric) and
+        'timestamp' as a string (the timestamp argument when the record has none).
+        """
+        reading = {}
+        for field, sources in self.plan(record.keys()).items():
+            value = None
+            for source in sources:
+                candidate = record[source]
+                # candidate != candidate: NaN of any float type
+                if candidate is not None and candidate == candidate:
+                    value = candidate
+                    break
+            if field == 'timestamp':
+                reading[field] = str(value) if value is not None else (timestamp or 'Unknown')
+                continue
+            try:
+                reading[field] = float(value) if value is not None else default
+            except (TypeError, ValueError):
+                reading[field] = default
+        return reading
+
+
+READING_SCHEMA = AliasMapper(COLUMN_ALIASES)
+
+
+def empty_frame():
+    frame = pd.DataFrame({name: np.empty(0, dtype=np.float32) for name in SENSOR_COLUMNS})
+    frame.insert(0, 'timestamp', pd.Series(np.empty(0, dtype='datetime64[ns]')))
+    return frame
+
+
+# Timestamp format of the last batch parsed from each source; a source keeps
+# one format, so its later batches skip inference
+_timestamp_formats = {}
+_timestamp_formats_lock = threading.Lock()
+
+
+def parse_timestamps(values, source=None):
+    """
+    Parse timestamps in one vectorized pass.
+
+    The format of the source's previous batch is tried first; when it does
+    not fit, it is inferred again from the first value. The whole column is
+    parsed with one explicit format and only values that do not match it
+    fall back to per-value parsing. Values with a UTC offset are converted
+    to UTC; unparseable values become NaT. source: name under which the
+    format is remembered (None: always infer).
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return _naive(series)
+    series = series.astype(object).where(series.notna(), None)
+    first = series.dropna()
+    first = str(first.iloc[0]) if len(first) else None
+    with _timestamp_formats_lock:
+        fmt = _timestamp_formats.get(source) if source is not None else None
+    if first is not None and (fmt is None or pd.isna(pd.to_datetime(first, format=fmt, errors='coerce', utc=True))):
+        fmt = guess_datetime_format(first)
+    try:
+        parsed = _naive(pd.to_datetime(series, errors='coerce', format=fmt, utc=True))
+    except ValueError:
+        # The inferred format does not fit this column at all
+        fmt = None
+        parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    if fmt is not None and source is not None:
+        with _timestamp_formats_lock:
+            _timestamp_formats[source] = fmt
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = _naive(pd.to_datetime(series[retry], errors='coerce', format='mixed', utc=True))
+    return parsed
+
+
+def _naive(parsed):
+    """datetime64[ns] without a time zone (aware values converted to UTC)"""
+    if getattr(parsed.dt, 'tz', None) is not None:
+        parsed = parsed.dt.tz_convert(None)
+    return parsed.astype('datetime64[ns]')
+
+
+def normalize_frame(raw, source=None):
+    """
+    Rename and cast a raw Sheet export (or any aliased table) into the
+    canonical history frame: a datetime64 'timestamp' column plus one float32
+    column per sensor, sorted by timestamp, plus a device_id column (None
+    where missing) when the source names the device. Rows without a
+    parseable timestamp are dropped; missing or non-numeric sensor values
+    become NaN. source: passed to parse_timestamps.
+    """
+    return _normalize(raw, source)[0]
+
+
+def _normalize(raw, source, reject_invalid=False):
+    """
+    normalize_frame, also returning how many rows were dropped. With
+    reject_invalid, rows holding a sensor value that is not a number are
+    dropped as well instead of reading it as NaN.
+    """
+    if raw is None or raw.empty:
+        return empty_frame(), 0
+
+    columns = {}
+    keep = np.ones(len(raw), dtype=bool)
+    for name, sources in READING_SCHEMA.plan(raw.columns).items():
+        # Coalesce aliases so rows that use different key names still line up
+        column = None
+        for alias in sources:
+            column = raw[alias] if column is None else column.fillna(raw[alias])
+        if name == 'timestamp':
+            columns[name] = parse_timestamps(column, source) if column is not None else pd.Series(pd.NaT, index=raw.index, dtype='datetime64[ns]')
+        elif column is not None:
+            numeric = pd.to_numeric(column, errors='coerce')
+            if reject_invalid:
+                keep &= ~(numeric.isna() & column.notna()).to_numpy()
+            columns[name] = numeric.astype(np.float32)
+        else:
+            columns[name] = pd.Series(np.nan, index=raw.index, dtype=np.float32)
+
+    devices = [alias for alias in DEVICE_ALIASES if alias in raw.columns]
+    if devices:
+        column = raw[devices[0]]
+        for alias in devices[1:]:
+            column = column.fillna(raw[alias])
+        columns['device_id'] = column.astype(object).where(column.notna(), None)
+
+    frame = pd.DataFrame(columns)
+    keep &= frame['timestamp'].notna().to_numpy()
+    frame = frame[keep]
+    return frame.sort_values('timestamp', kind='stable').reset_index(drop=True), int((~keep).sum())
+
+
+def records_to_frame(records, source='firebase'):
+    """Normalize a Firebase-style {key: {sensor values}} dict; entry keys stand in for missing timestamps"""
+    if not records:
+        return empty_frame()
+    rows = []
+    for key, values in records.items():
+        if isinstance(values, dict):
+            if 'timestamp' not in values and 'date' not in values:
+                values = dict(values, timestamp=key)
+            rows.append(values)
+    return normalize_frame(pd.DataFrame.from_records(rows), source) if rows else empty_frame()
+
+
+def csv_options():
+    """
+    read_csv arguments that read only known columns, as text: normalize_frame
+    coerces the sensors, so a stray non-numeric cell becomes NaN instead of
+    failing the whole read
+    """
+    known = {alias for aliases in COLUMN_ALIASES.values() for alias in aliases} | set(DEVICE_ALIASES)
+    return {'usecols': lambda column: column in known, 'dtype': {alias: object for alias in known}}
+
+
+def iter_csv_frames(fileobj, chunksize, after=None, source='sheet'):
+    """
+    Parse a CSV stream in bounded chunks, yielding normalized frames.
+
+    Only known sensor/timestamp columns are read. after: a datetime64 value;
+    chunks whose last row is not newer are skipped without normalizing (the
+    Sheet is an append-only log).
+    """
+    reader = pd.read_csv(fileobj, chunksize=chunksize, **csv_options())
+    for chunk in reader:
+        if after is not None:
+            stamp_column = next((alias for alias in COLUMN_ALIASES['timestamp'] if alias in chunk.columns), None)
+            if stamp_column is not None:
+                last = parse_timestamps(chunk[stamp_column].iloc[-1:], source).iloc[0]
+                if pd.notna(last) and last <= after:
+                    continue
+        yield normalize_frame(chunk, source)
+
+
+def parse_batch(body, content_type):
+    """
+    Parse an uploaded batch of readings into (normalized frame, number of
+    invalid readings). Readings whose timestamp cannot be parsed or that hold
+    a sensor value that is not a number are invalid and left out of the frame.
+    content_type selects the format: text/csv, application/x-ndjson (one
+    JSON object per line), application/json (an array of objects) or the
+    binary wire_format batch (application/x-hapag-readings or
+    application/octet-stream). Raises ValueError on a malformed body.
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in (wire_format.CONTENT_TYPE, 'application/octet-stream'):
+        return wire_format.decode_frame(body), 0
+    if content_type in ('text/csv', 'application/csv'):
+        try:
+            raw = pd.read_csv(io.BytesIO(body), **csv_options())
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            raise ValueError(f"invalid CSV: {e}")
+        return _normalize(raw, 'upload', reject_invalid=True)
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        records = json.loads(body)
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("expected a list of reading objects")
+    if not records:
+        return empty_frame(), 0
+    return _normalize(pd.DataFrame.from_records(records), 'upload', reject_invalid=True)
+
+
+def validate_frame(frame):
+    """
+    Split a normalized frame into (valid, rejected) rows using SENSOR_BOUNDS.
+    Missing sensors (NaN) are allowed; a value outside its bounds rejects the reading.
+    """
+    valid = np.ones(len(frame), dtype=bool)
+    for name, (low, high) in SENSOR_BOUNDS.items():
+        values = frame[name].to_numpy()
+        valid &= np.isnan(values) | ((values >= low) & (values <= high))
+    return frame[valid], frame[~valid]
@@ -0,0 +1,149 @@
+# Hapag Farm - Columnar Sensor Store
+import os
+import threading
+import numpy as np
+import pandas as pd
+from sensor_schema import SENSOR_COLUMNS
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: appends are still serialized per process by the thread lock
+    fcntl = None
+
+TIMESTAMP_FILE = 'timestamp.i8'
+NAT = np.iinfo(np.int64).min
+
+
+class SensorStore:
+    """
+    Append-only local history of sensor readings.
+
+    Every sensor is stored as its own float32 column file next to a sorted
+    int64 timestamp file (nanoseconds since epoch). Columns are memory-mapped
+    on read, so request handlers never re-download or re-parse the history.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rows = -1
+        self._arrays = None
+
+    def _column_path(self, name):
+        if name == 'timestamp':
+            return os.path.join(self.path, TIMESTAMP_FILE)
+        return os.path.join(self.path, f"{name}.f4")
+
+    def _file_rows(self):
+        """Rows fully written to every column (the timestamp file is written last)"""
+        rows = []
+        for name in ['timestamp'] + SENSOR_COLUMNS:
+            path = self._column_path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            rows.append(size // (8 if name == 'timestamp' else 4))
+        return min(rows)
+
+    def _map(self, name, rows):
+        dtype = np.int64 if name == 'timestamp' else np.float32
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(rows,))
+
+    def columns(self):
+        """Return {'timestamp': int64 ns, sensor: float32} read-only arrays"""
+        with self._lock:
+            rows = self._file_rows()
+            if rows != self._rows:
+                self._arrays = {name: self._map(name, rows) for name in ['timestamp'] + SENSOR_COLUMNS}
+                self._rows = rows
+            return self._arrays
+
+    def __len__(self):
+        return len(self.columns()['timestamp'])
+
+    @property
+    def version(self):
+        """Changes whenever rows are appended (the store never rewrites history)"""
+        return len(self)
+
+    def last_timestamp(self):
+        timestamps = self.columns()['timestamp']
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def frame(self):
+        """History as a DataFrame sorted by timestamp"""
+        arrays = self.columns()
+        data = {'timestamp': np.asarray(arrays['timestamp']).view('datetime64[ns]')}
+        for name in SENSOR_COLUMNS:
+            data[name] = np.asarray(arrays[name])
+        return pd.DataFrame(data)
+
+    def latest(self):
+        """Most recent reading as a plain dict, or None when empty"""
+        arrays = self.columns()
+        if not len(arrays['timestamp']):
+            return None
+        reading = {name: float(arrays[name][-1]) for name in SENSOR_COLUMNS}
+        reading['timestamp'] = pd.Timestamp(int(arrays['timestamp'][-1])).isoformat()
+        return reading
+
+    def append_frame(self, frame):
+        """
+        Append a normalized history frame (see sensor_schema.normalize_frame);
+        only readings newer than the stored history are written.
+        Returns the number of rows written.
+        """
+        if frame is None or frame.empty:
+            return 0
+        last = self.last_timestamp()
+        if last is not None and frame['timestamp'].max().value <= last:
+            return 0
+        ts = frame['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        values = {name: frame[name].to_numpy(dtype=np.float32) for name in SENSOR_COLUMNS}
+
+        valid = ts != NAT
+        ts = ts[valid]
+        order = np.argsort(ts, kind='stable')
+        ts = ts[order]
+        # Keep the last reading for duplicated timestamps
+        keep = np.append(ts[1:] != ts[:-1], True) if len(ts) else np.zeros(0, dtype=bool)
+        ts = ts[keep]
+        for name in SENSOR_COLUMNS:
+            values[name] = values[name][valid][order][keep]
+
+        with self._lock:
+            lock_file = open(os.path.join(self.path, '.lock'), 'w')
+            try:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                rows = self._file_rows()
+                self._truncate(rows)
+                if rows:
+                    last = np.fromfile(self._column_path('timestamp'), dtype=np.int64, count=1, offset=(rows - 1) * 8)[0]
+                    newer = ts > last
+                    ts = ts[newer]
+                    for name in SENSOR_COLUMNS:
+                        values[name] = values[name][newer]
+                if not len(ts):
+                    return 0
+                for name in SENSOR_COLUMNS:
+                    with open(self._column_path(name), 'ab') as f:
+                        f.write(values[name].tobytes())
+                with open(self._column_path('timestamp'), 'ab') as f:
+                    f.write(ts.tobytes())
+                return len(ts)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _truncate(self, rows):
+        """Drop partially written rows left behind by an interrupted append"""
+        for name in ['timestamp'] + SENSOR_COLUMNS:
+            path = self._column_path(name)
+            size = rows * (8 if name == 'timestamp' else 4)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
@@ -0,0 +1,81 @@
+# Hapag Farm - Tail-Only Google Sheet Reader
+import io
+import threading
+import pandas as pd
+from sensor_schema import COLUMN_ALIASES
+from upstream_client import upstream
+
+
+def column_letter(index):
+    """0-based column index -> sheet column letters (0 -> A, 26 -> AA)"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+class SheetTailReader:
+    """
+    Reads only the rows appended to a Google Sheet since the last call.
+
+    Uses the Sheets visualization query endpoint (gviz/tq) with
+    "select * offset <rows seen>", so each poll transfers the new rows only
+    and the cost of finding the latest reading does not depend on how long
+    the sheet is. The row count is looked up with "select count(<timestamp
+    column>)" (count skips blank cells, and every reading has a timestamp)
+    on the first call, and again whenever no new rows come back, so rows
+    deleted from the sheet move the offset back instead of past the end.
+    """
+
+    def __init__(self, sheet_id, client=None, base_url='https://docs.google.com', timestamp_column=None):
+        self.url = f"{base_url}/spreadsheets/d/{sheet_id}/gviz/tq"
+        self.client = client or upstream
+        self.timestamp_column = timestamp_column
+        self.rows_seen = None
+        self.last_row = None
+        self._lock = threading.Lock()
+
+    def _query(self, query):
+        response = self.client.get(self.url, params={'tqx': 'out:csv', 'headers': 1, 'tq': query})
+        response.raise_for_status()
+        if not response.content.strip():
+            return pd.DataFrame()
+        return pd.read_csv(io.BytesIO(response.content))
+
+    def _find_timestamp_column(self):
+        """Letter of the first header matching a timestamp alias (A when none does)"""
+        header = list(self._query('select * limit 1').columns)
+        for alias in COLUMN_ALIASES['timestamp']:
+            if alias in header:
+                return column_letter(header.index(alias))
+        return 'A'
+
+    def _count_rows(self):
+        if self.timestamp_column is None:
+            self.timestamp_column = self._find_timestamp_column()
+        counts = self._query(f'select count({self.timestamp_column})')
+        return int(counts.iloc[0, 0]) if not counts.empty else 0
+
+    def _read_from(self, offset):
+        self.rows_seen = offset
+        new_rows = self._query(f'select * offset {offset}')
+        if not new_rows.empty:
+            self.rows_seen += len(new_rows)
+            self.last_row = new_rows.iloc[-1]
+        return new_rows
+
+    def latest_row(self):
+        """Last sheet row as a pandas Series, or None if the sheet is empty"""
+        with self._lock:
+            if self.rows_seen is None:
+                self._read_from(max(self._count_rows() - 1, 0))
+                return self.last_row
+            if self._read_from(self.rows_seen).empty and self.rows_seen > 0:
+                # Nothing new: check the offset is not past the end because rows were deleted
+                total = self._count_rows()
+                if total < self.rows_seen:
+                    self.last_row = None
+                    self._read_from(max(total - 1, 0))
+            return self.last_row
@@ -0,0 +1,64 @@
+# Hapag Farm - Single-Flight Call Coalescing
+import functools
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, callers arriving while it is in flight wait for it and share
+    its result (or exception) instead of starting their own upstream fetch.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            counters = self._counters.setdefault(key, {'calls': 0, 'executions': 0, 'coalesced': 0})
+            counters['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counters['executions'] += 1
+            else:
+                counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def coalesce(self, key):
+        """Decorator form of do()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return self.do(key, fn, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            return {key: dict(values) for key, values in self._counters.items()}
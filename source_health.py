@@ -0,0 +1,108 @@
+# Hapag Farm - Upstream Source Health and Circuit Breaker
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class SourceHealth:
+    """Latency and error tracking plus circuit state for one upstream"""
+
+    def __init__(self, name, window=20):
+        self.name = name
+        self.latency = None  # EWMA, seconds
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.last_used = 0.0
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+
+class SourceSelector:
+    """
+    Tracks latency and error rate per upstream source and routes reads to
+    the fastest healthy one.
+
+    After failure_threshold consecutive failures a source's circuit opens and
+    it is skipped for cooldown seconds; then one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit. Healthy
+    sources that have not been tried for probe_interval seconds are moved to
+    the front once, so a source that recovers from being slow is noticed.
+    """
+
+    def __init__(self, sources, failure_threshold=3, cooldown=30.0, probe_interval=60.0, alpha=0.3):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.alpha = alpha
+        self._health = {name: SourceHealth(name) for name in sources}
+        self._lock = threading.Lock()
+
+    def allow(self, name):
+        with self._lock:
+            health = self._health[name]
+            if health.state == OPEN and time.time() - health.opened_at >= self.cooldown:
+                health.state = HALF_OPEN
+                return True
+            return health.state == CLOSED
+
+    def order(self):
+        """Source names, fastest healthy first; open circuits last"""
+        now = time.time()
+        with self._lock:
+            healths = list(self._health.values())
+
+        def rank(health):
+            stale = health.state == CLOSED and now - health.last_used > self.probe_interval
+            latency = health.latency if health.latency is not None else 0.0
+            return (health.state == OPEN, not stale, latency)
+
+        return [health.name for health in sorted(healths, key=rank)]
+
+    def record(self, name, ok, latency=None):
+        with self._lock:
+            health = self._health[name]
+            health.last_used = time.time()
+            health.outcomes.append(1 if ok else 0)
+            if latency is not None:
+                health.latency = latency if health.latency is None else (
+                    self.alpha * latency + (1 - self.alpha) * health.latency)
+            if ok:
+                health.consecutive_failures = 0
+                health.state = CLOSED
+            else:
+                health.consecutive_failures += 1
+                if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                    health.state = OPEN
+                    health.opened_at = time.time()
+
+    def call(self, name, fn, *args, **kwargs):
+        """Run fn against source name, recording latency and outcome (falsy results count as failures)"""
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(name, False, time.perf_counter() - start)
+            raise
+        self.record(name, bool(result), time.perf_counter() - start)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                health.name: {
+                    'state': health.state,
+                    'latency_ms': round(health.latency * 1000, 1) if health.latency is not None else None,
+                    'error_rate': round(health.error_rate(), 3),
+                    'consecutive_failures': health.consecutive_failures,
+                }
+                for health in self._health.values()
+            }
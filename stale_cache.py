@@ -0,0 +1,77 @@
+# Hapag Farm - Stale-While-Revalidate Cache
+import threading
+import time
+
+
+class StaleWhileRevalidateCache:
+    """
+    Caches the result of fetch() for ttl seconds.
+
+    After the TTL the cached value is still returned immediately while one
+    background thread refreshes it. Failed refreshes (an exception, or a value
+    rejected by valid()) keep the last good value, which keeps being served
+    until it is max_stale seconds old. Only the very first call, or a call
+    after max_stale has passed, waits on fetch() itself.
+    """
+
+    def __init__(self, fetch, ttl, max_stale, valid=None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.valid = valid or (lambda value: value is not None)
+        self._value = None
+        self._fetched_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.failures = 0
+
+    def age(self):
+        """Seconds since the cached value was fetched, or None"""
+        fetched_at = self._fetched_at
+        return None if fetched_at is None else time.time() - fetched_at
+
+    def get(self):
+        """Return (value, age_seconds); value is None when nothing usable is cached"""
+        age = self.age()
+        if age is None or age > self.max_stale:
+            self.refresh()
+            age = self.age()
+            if age is None or age > self.max_stale:
+                return None, age
+        elif age > self.ttl:
+            self.refresh_async()
+        return self._value, age
+
+    def refresh(self):
+        """Fetch now in the calling thread; returns whether a new value was stored"""
+        try:
+            value = self.fetch()
+        except Exception as e:
+            print(f"Cache refresh error: {e}")
+            value = None
+        with self._lock:
+            if self.valid(value):
+                self._value = value
+                self._fetched_at = time.time()
+                return True
+            self.failures += 1
+            return False
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name='cache-refresh', daemon=True).start()
+
+    def _background_refresh(self):
+        # Only the thread refresh_async started clears the flag it set
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def stats(self):
+        return {'age_seconds': self.age(), 'ttl': self.ttl, 'max_stale': self.max_stale,
+                'failures': self.failures}
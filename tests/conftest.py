@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+# The app modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The Flask app module, imported with its stores in a temporary directory and no background ingestion"""
+    store = tmp_path_factory.mktemp('sensor_store')
+    os.environ.update({'SENSOR_STORE_DIR': str(store), 'INGEST_ENABLED': '0'})
+    import app
+    # Tests write readings themselves; never pull history from the real upstream sources
+    app.refresh_history = lambda: None
+    return app
@@ -0,0 +1,64 @@
+import math
+import pandas as pd
+from sensor_schema import COLUMN_ALIASES, READING_SCHEMA, AliasMapper
+
+
+def legacy_sheet_reading(last_row):
+    # The chained .get lookups get_sheet_latest used before the mapper
+    return {
+        'N': float(last_row.get('N (ppm)', last_row.get('N', 0))),
+        'P': float(last_row.get('P (ppm)', last_row.get('P', 0))),
+        'K': float(last_row.get('K (ppm)', last_row.get('K', 0))),
+        'ph': float(last_row.get('pH', last_row.get('ph', 0))),
+        'humidity': float(last_row.get('Humidity', last_row.get('humidity', 0))),
+        'ec': float(last_row.get('EC', 0)),
+        'temperature': float(last_row.get('Temp', last_row.get('Temperature', 0))),
+        'timestamp': str(last_row.get('Timestamp', last_row.get('timestamp', 'Unknown'))),
+    }
+
+
+def test_plan_lists_present_aliases_in_preference_order():
+    plan = AliasMapper(COLUMN_ALIASES).plan(['N', 'N (ppm)', 'ph', 'moisture', 'date'])
+    assert plan['N'] == ['N (ppm)', 'N']
+    assert plan['ph'] == ['ph']
+    assert plan['humidity'] == ['moisture']
+    assert plan['timestamp'] == ['date']
+    assert plan['ec'] == []
+
+
+def test_plan_is_cached_per_key_layout():
+    mapper = AliasMapper(COLUMN_ALIASES, max_plans=2)
+    assert mapper.plan(('N', 'P')) is mapper.plan(['N', 'P'])
+    mapper.plan(['K'])
+    mapper.plan(['ph'])
+    assert len(mapper._plans) <= 2
+
+
+def test_sheet_rows_match_legacy_lookups():
+    rows = [
+        {'Timestamp': '2024-06-01 08:00:00', 'N (ppm)': '120', 'P (ppm)': '45', 'K (ppm)': '80', 'pH': '6.5',
+         'Humidity': '70', 'EC': '1.2', 'Temp': '28.5'},
+        {'timestamp': '2024-06-01 09:00:00', 'N': 10, 'P': 20, 'K': 30, 'ph': 7.0, 'humidity': 55,
+         'Temperature': 30},
+        {'N (ppm)': 5, 'N': 99, 'pH': 5.5},
+    ]
+    for row in rows:
+        assert READING_SCHEMA.reading(pd.Series(row)) == legacy_sheet_reading(row)
+
+
+def test_firebase_aliases_and_fallbacks():
+    reading = READING_SCHEMA.reading({'nitrogen': 12, 'phosphorus': '7', 'potassium': 'n/a', 'moisture': 40,
+                                      'date': '2024-06-01'}, timestamp='-key-')
+    assert reading['N'] == 12.0 and reading['P'] == 7.0
+    assert reading['K'] == 0.0
+    assert reading['humidity'] == 40.0
+    assert reading['timestamp'] == '2024-06-01'
+    assert READING_SCHEMA.reading({'N': 1}, timestamp='-key-')['timestamp'] == '-key-'
+
+
+def test_missing_value_falls_through_to_next_alias():
+    reading = READING_SCHEMA.reading(pd.Series({'N (ppm)': math.nan, 'N': 42.0, 'pH': None, 'ph': 6.1}))
+    assert reading['N'] == 42.0
+    assert reading['ph'] == 6.1
+    assert READING_SCHEMA.reading({'N': None})['N'] == 0.0
+    assert math.isnan(READING_SCHEMA.reading({'N': None}, default=math.nan)['N'])
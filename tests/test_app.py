@@ -0,0 +1,133 @@
+import io
+import json
+import time
+import pandas as pd
+from sensor_schema import records_to_frame
+
+
+def test_stream_mode_latest_reading_does_not_block(app_module, monkeypatch):
+    # Stream mode: the listener runs, the polling worker does not, and no event has arrived yet
+    monkeypatch.setattr(app_module.firebase_stream, 'is_running', lambda: True)
+    started = time.monotonic()
+    reading, _, _ = app_module.get_latest_reading()
+    assert time.monotonic() - started < 1
+    # Nothing from upstream yet: only a stored reading, if any, is served
+    assert reading == app_module.latest_stored_reading()[0]
+
+
+def test_analytics_data_follows_new_writes(app_module):
+    client = app_module.app.test_client()
+    app_module.store_frame(records_to_frame({'2024-03-01T08:00:00': {'N': 90}, '2024-03-01T08:01:00': {'N': 91}}))
+    before = client.get('/api/analytics_data').get_json()['data_count']
+    app_module.store_frame(records_to_frame({'2024-03-01T08:02:00': {'N': 92}}))
+    assert client.get('/api/analytics_data').get_json()['data_count'] == before + 1
+
+
+def post_readings(app_module, body, token=None, content_type='application/json'):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    return app_module.app.test_client().post('/api/readings', data=body, headers=headers, content_type=content_type)
+
+
+def test_readings_upload_refused_without_configured_token(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'INGEST_TOKEN', None)
+    monkeypatch.setattr(app_module, 'INGEST_OPEN', False)
+    assert post_readings(app_module, '[]').status_code == 401
+    monkeypatch.setattr(app_module, 'INGEST_OPEN', True)
+    assert post_readings(app_module, '[]').status_code == 200
+
+
+def test_readings_upload_checks_token(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'INGEST_TOKEN', 'secret')
+    assert post_readings(app_module, '[]').status_code == 401
+    assert post_readings(app_module, '[]', token='wrong').status_code == 401
+    assert post_readings(app_module, '[]', token='secret').status_code == 200
+
+
+def test_readings_upload_body_is_capped(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'INGEST_TOKEN', 'secret')
+    monkeypatch.setitem(app_module.app.config, 'MAX_CONTENT_LENGTH', 64)
+    assert post_readings(app_module, '[' + '{"N": 1},' * 20 + '{}]', token='secret').status_code == 413
+
+
+def test_readings_upload_counts_invalid_rows_as_rejected(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'INGEST_TOKEN', 'secret')
+    body = json.dumps([
+        {'timestamp': '2030-01-01T08:00:00', 'N': 95, 'ph': 6.8},
+        {'timestamp': '2030-01-01T08:01:00', 'N': 96, 'ph': 6.8},
+        {'timestamp': '2030-01-01T08:01:00', 'N': 97, 'ph': 6.9},
+        {'timestamp': 'not a time', 'N': 95},
+        {'timestamp': '2030-01-01T08:02:00', 'N': 'ERR'},
+        {'timestamp': '2030-01-01T08:03:00', 'ph': 15},
+    ])
+    result = post_readings(app_module, body, token='secret').get_json()
+    assert result == {'accepted': 2, 'rejected': 3, 'duplicates': 1}
+    csv = 'Timestamp,N (ppm)\n2030-01-02 08:00:00,95\n2030-01-02 08:01:00,ERR\n,96\n'
+    result = post_readings(app_module, csv, token='secret', content_type='text/csv').get_json()
+    assert result == {'accepted': 1, 'rejected': 2, 'duplicates': 0}
+
+
+def test_recent_readings_include_late_arrivals(app_module):
+    client = app_module.app.test_client()
+    app_module.store_frame(records_to_frame({'2031-01-01T08:00:00': {'humidity': 70}, '2031-01-01T08:02:00': {'humidity': 72}}))
+    assert client.get('/api/recent?n=3').get_json()['humidity']['values'][-2:] == [70, 72]
+    # A late reading with an older timestamp, written straight to the reading DB (e.g. by another worker)
+    app_module.reading_db.insert_frame(records_to_frame({'2031-01-01T08:01:00': {'humidity': 71}}))
+    assert client.get('/api/recent?n=3').get_json()['humidity']['values'] == [70, 71, 72]
+    # Newer readings are appended to the same rings
+    _, rings = app_module.catch_up_recent()
+    app_module.store_frame(records_to_frame({'2031-01-01T08:03:00': {'humidity': 73}}))
+    assert app_module.catch_up_recent()[1] is rings
+    assert client.get('/api/recent?n=3').get_json()['humidity']['values'] == [71, 72, 73]
+
+
+def test_store_frame_keeps_other_devices_and_late_readings(app_module):
+    db = app_module.reading_db
+    device_a = records_to_frame({'2032-01-01T08:05:00': {'N': 90, 'device_id': 'a'}})
+    device_b = records_to_frame({'2032-01-01T08:03:00': {'N': 80, 'device_id': 'b'}})
+    late = records_to_frame({'2032-01-01T08:01:00': {'N': 85, 'device_id': 'a'}})
+    assert app_module.store_frame(device_a) == 1
+    assert app_module.store_frame(device_b) == 1
+    assert app_module.store_frame(late) == 1
+    stored = db.range('2032-01-01', '2032-01-02')
+    assert sorted(zip(stored['device_id'], stored['N'])) == [('a', 85.0), ('a', 90.0), ('b', 80.0)]
+
+
+def test_sheet_ingest_resumes_after_sheet_cursor(app_module, monkeypatch):
+    from upstream_client import Download
+    rows = ['Timestamp,N (ppm)', '2033-01-01 08:00:00,90', '2033-01-01 08:01:00,91']
+    exports = iter(['\n'.join(rows), '\n'.join(rows + ['2033-01-01 08:02:00,92'])])
+    monkeypatch.setattr(app_module.sheet_history_source, 'open',
+                        lambda: Download(io.BytesIO(next(exports).encode()), None, None, None))
+    monkeypatch.setattr(app_module.sheet_history_source, 'commit', lambda download: None)
+    monkeypatch.setattr(app_module, 'SHEET_CHUNK_ROWS', 2)
+    assert app_module.ingest_sheet_history() == 2
+    assert app_module.reading_db.meta(app_module.SHEET_CURSOR) == pd.Timestamp('2033-01-01 08:01:00').value
+    # The first chunk is no newer than the cursor and is skipped
+    assert app_module.ingest_sheet_history() == 1
+    assert len(app_module.reading_db.range('2033-01-01', '2033-01-02')) == 3
+
+
+def test_uploaded_readings_are_served_as_latest(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'INGEST_TOKEN', 'secret')
+    upstream = ({'N': 50.0, 'ph': 6.0}, '2034-01-01 07:00:00')
+    monkeypatch.setattr(app_module.latest_cache, 'get', lambda: (upstream, 3.0))
+    body = json.dumps([{'timestamp': '2034-01-01T08:00:00', 'N': 120, 'ph': 6.5}])
+    assert post_readings(app_module, body, token='secret').get_json()['accepted'] == 1
+    latest = app_module.app.test_client().get('/api/refresh').get_json()
+    assert latest['connected'] and latest['N'] == 120.0 and latest['age_seconds'] == 0.0
+    # A newer upstream reading wins again
+    upstream = ({'N': 60.0, 'ph': 6.0}, '2034-01-01 09:00:00')
+    assert app_module.app.test_client().get('/api/refresh').get_json()['N'] == 60.0
+
+
+def test_history_cache_is_safe_across_threads(app_module):
+    from concurrent.futures import ThreadPoolExecutor
+
+    def use(i):
+        key = ('test', i % 200)
+        return app_module.cached_for_history(key, 1, lambda: (i % 200, 1))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(use, range(4000)))
+    assert results == [i % 200 for i in range(4000)]
+    assert len(app_module._history_cache) <= app_module.HISTORY_CACHE_SIZE
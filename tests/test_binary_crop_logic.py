@@ -0,0 +1,63 @@
+import itertools
+import numpy as np
+import binary_crop_logic as logic
+from binary_crop_logic import CODE_STRINGS, CROP_MAP, STATUS_LABELS
+
+
+def legacy_recommendation(n, p, k):
+    # The string-building code and dict lookup used before the compiled table
+    binary_code = (f"{1 if n > logic.N_HIGH else 0}{1 if n < logic.N_LOW else 0}"
+                   f"{1 if p > logic.P_HIGH else 0}{1 if p < logic.P_LOW else 0}{1 if k > logic.K_HIGH else 0}")
+    crops = CROP_MAP.get(binary_code, [])
+    return crops, binary_code, 95 if len(crops) > 0 else 0
+
+
+def legacy_status(n, p, k):
+    return {
+        "N": "HIGH" if n > logic.N_HIGH else ("LOW" if n < logic.N_LOW else "MEDIUM"),
+        "P": "HIGH" if p > logic.P_HIGH else ("LOW" if p < logic.P_LOW else "MEDIUM"),
+        "K": "HIGH" if k > logic.K_HIGH else ("LOW" if k < logic.K_LOW else "MEDIUM"),
+    }
+
+
+def threshold_values(low, high):
+    # Each side of and exactly on both thresholds, plus NaN
+    return [0, low - 0.1, low, low + 0.1, (low + high) / 2, high - 0.1, high, high + 0.1, 1000, np.nan]
+
+
+SAMPLES = list(itertools.product(threshold_values(logic.N_LOW, logic.N_HIGH),
+                                 threshold_values(logic.P_LOW, logic.P_HIGH),
+                                 threshold_values(logic.K_LOW, logic.K_HIGH)))
+
+
+def test_table_covers_every_code():
+    assert len(logic.CROP_TABLE) == 32
+    for code, bits in enumerate(CODE_STRINGS):
+        assert bits == format(code, '05b')
+        assert list(logic.CROP_TABLE[code]) == CROP_MAP[bits]
+
+
+def test_scalar_api_matches_legacy_logic():
+    for n, p, k in SAMPLES:
+        assert logic.get_binary_crop_recommendation(n, p, k) == legacy_recommendation(n, p, k)
+        assert logic.get_npk_binary_code(n, p, k) == legacy_recommendation(n, p, k)[1]
+        assert logic.get_npk_status(n, p, k) == legacy_status(n, p, k)
+
+
+def test_vectorized_api_matches_legacy_logic():
+    n, p, k = (np.array(column) for column in zip(*SAMPLES))
+    crops, codes, confidence, status = logic.get_binary_crop_recommendations(n, p, k)
+    for i, sample in enumerate(SAMPLES):
+        expected_crops, expected_code, expected_confidence = legacy_recommendation(*sample)
+        assert list(crops[i]) == expected_crops
+        assert CODE_STRINGS[codes[i]] == expected_code
+        assert confidence[i] == expected_confidence
+        assert {name: labels[i] for name, labels in status.items()} == legacy_status(*sample)
+    assert set(STATUS_LABELS) == {'LOW', 'MEDIUM', 'HIGH'}
+
+
+def test_crops_from_binary_accepts_strings_and_codes():
+    assert logic.get_crops_from_binary('00011') == ['SWEET POTATOES', 'SITAW']
+    assert logic.get_crops_from_binary(0b00011) == ['SWEET POTATOES', 'SITAW']
+    for unknown in ('', 'xyz', '100000', 32, -1):
+        assert logic.get_crops_from_binary(unknown) == CROP_MAP.get(unknown, [])
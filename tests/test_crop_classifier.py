@@ -0,0 +1,35 @@
+import warnings
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from sklearn.tree import DecisionTreeClassifier
+from crop_classifier import FEATURES, CropClassifier
+
+
+def make_classifier(fit_on_frame):
+    encoder = LabelEncoder().fit(['rice', 'corn'])
+    X = np.array([[100, 50, 50, 6.0, 80], [20, 20, 20, 7.0, 40]], dtype=np.float64)
+    y = encoder.transform(['rice', 'corn'])
+    model = DecisionTreeClassifier().fit(pd.DataFrame(X, columns=FEATURES) if fit_on_frame else X, y)
+    return CropClassifier(model, encoder, {'rice': 'Palay'})
+
+
+def test_frame_fitted_model_predicts_without_feature_name_warning():
+    classifier = make_classifier(fit_on_frame=True)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert classifier.predict(100, 50, 50, 6.0, 80) == ('Palay', 100.0)
+        assert classifier.predict(20, 20, 20, 7.0, 40) == ('Corn', 100.0)
+
+
+def test_array_fitted_model_takes_plain_rows():
+    classifier = make_classifier(fit_on_frame=False)
+    assert classifier.columns is None
+    assert classifier.predict(100, 50, 50, 6.0, 80) == ('Palay', 100.0)
+
+
+def test_inputs_outside_sensor_bounds_are_rejected():
+    classifier = make_classifier(fit_on_frame=True)
+    assert classifier.predict(100, 50, 50, 15, 80) == (None, 0)
+    assert classifier.predict(100, 50, 50, 6.0, 101) == (None, 0)
+    assert classifier.predict('x', 50, 50, 6.0, 80) == (None, 0)
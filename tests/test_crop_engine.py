@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from crop_engine import CROP_PARAMETERS, CropEngine
+
+
+def legacy_recommendation(crop_database, n, p, k, ph, hum):
+    # The per-crop loop get_expert_recommendation ran before CropEngine
+    values = {'N': n, 'P': p, 'K': k, 'pH': ph, 'humidity': hum}
+    crop_scores = {}
+    for crop, requirements in crop_database.items():
+        score = 0
+        for param, (min_val, max_val) in requirements.items():
+            value = values[param]
+            if min_val <= value <= max_val:
+                score += 2
+            elif abs(value - min_val) <= 20 or abs(value - max_val) <= 20:
+                score += 1
+        crop_scores[crop] = (score / 10) * 100
+    best_crop = max(crop_scores, key=crop_scores.get)
+    return (best_crop if crop_scores[best_crop] >= 40 else "Rice"), crop_scores
+
+
+def boundary_readings(crop_database, count, seed=7):
+    # Values on, just inside and just outside every bound and every near band
+    candidates = []
+    for param in CROP_PARAMETERS:
+        bounds = {value for requirements in crop_database.values() for value in requirements[param]}
+        values = {bound + offset for bound in bounds for offset in (-20.5, -20, -0.5, 0, 0.5, 20, 20.5)}
+        candidates.append(sorted(values) + [np.nan])
+    rng = np.random.default_rng(seed)
+    return np.array([[rng.choice(values) for values in candidates] for _ in range(count)])
+
+
+def test_matches_legacy_loop(app_module):
+    crop_database = app_module.CROP_DATABASE
+    engine = CropEngine(crop_database)
+    readings = boundary_readings(crop_database, 3000)
+    names, best_scores, scores = engine.recommend(readings)
+    for row, name, best_score, row_scores in zip(readings, names, best_scores, scores):
+        expected_name, expected_scores = legacy_recommendation(crop_database, *row)
+        assert name == expected_name
+        assert row_scores.tolist() == pytest.approx([expected_scores[crop] for crop in engine.crops])
+        assert best_score == pytest.approx(max(expected_scores.values()))
+
+
+def test_single_reading_path(app_module):
+    for reading in ([60, 20, 100, 6.0, 70], [0, 0, 0, 0, 0], [500, 500, 500, 14, 100]):
+        expected, _ = legacy_recommendation(app_module.CROP_DATABASE, *reading)
+        assert app_module.get_expert_recommendation(*reading) == expected
+
+
+def test_ties_go_to_first_crop_and_low_scores_to_default():
+    crop_database = {
+        'A': {param: (0, 10) for param in CROP_PARAMETERS},
+        'B': {param: (0, 10) for param in CROP_PARAMETERS},
+    }
+    names, best_scores, _ = CropEngine(crop_database).recommend([[5, 5, 5, 5, 5], [100, 100, 100, 100, 100]])
+    assert names.tolist() == ['A', 'Rice']
+    assert best_scores.tolist() == [100.0, 0.0]
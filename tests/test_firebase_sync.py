@@ -0,0 +1,157 @@
+import copy
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from firebase_sync import FirebaseCursorSync, FirebaseStreamListener, iter_sse_events
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def make_sync(tmp_path, entries, page_size=2):
+    sync = FirebaseCursorSync('https://example.firebaseio.com', '/sensor_logs.json',
+                              cursor_path=str(tmp_path / 'cursor.json'), page_size=page_size)
+
+    def get(params):
+        keys = sorted(entries)
+        if 'startAt' in params:
+            keys = [key for key in keys if key >= json.loads(params['startAt'])]
+        return FakeResponse({key: entries[key] for key in keys[:params['limitToFirst']]})
+
+    sync._get = get
+    return sync
+
+
+ENTRIES = {f'2024-03-01T08:0{i}:00': {'N': 90 + i} for i in range(5)}
+
+
+def test_fetch_new_pages_without_moving_cursor(tmp_path):
+    sync = make_sync(tmp_path, ENTRIES)
+    entries, cursor = sync.fetch_new()
+    assert entries == ENTRIES
+    assert cursor == max(ENTRIES)
+    assert sync.cursor is None
+    assert not (tmp_path / 'cursor.json').exists()
+
+
+def test_advance_persists_cursor(tmp_path):
+    sync = make_sync(tmp_path, ENTRIES)
+    _, cursor = sync.fetch_new()
+    sync.advance(cursor)
+    assert sync.fetch_new() == ({}, cursor)
+    resumed = make_sync(tmp_path, ENTRIES)
+    assert resumed.cursor == cursor
+
+
+def test_sync_stores_new_entries_then_advances(tmp_path):
+    class Store:
+        def __init__(self):
+            self.records = {}
+
+        def insert_records(self, records):
+            self.records.update(records)
+            return len(records)
+
+    store = Store()
+    sync = make_sync(tmp_path, ENTRIES)
+    assert sync.sync(store) == len(ENTRIES)
+    assert store.records == ENTRIES and sync.cursor == max(ENTRIES)
+    assert sync.sync(store) == 0
+
+
+def test_sync_keeps_cursor_when_store_fails(tmp_path):
+    class FailingStore:
+        def insert_records(self, records):
+            raise OSError('disk full')
+
+    sync = make_sync(tmp_path, ENTRIES)
+    with pytest.raises(OSError):
+        sync.sync(FailingStore())
+    assert sync.cursor is None
+    assert sync.fetch_new()[0] == ENTRIES
+
+
+SSE_LINES = [
+    'event: put',
+    'data: {"path": "/", "data": {"k1": {"N": 90}, "k2": {"N": 91}}}',
+    '',
+    ': comment',
+    'event: keep-alive',
+    'data: null',
+    '',
+    'event: patch',
+    'data: {"path": "/k2", "data": {"P": 22}}',
+    '',
+    'event: put',
+    'data: {"path": "/k3/K", "data": 135}',
+    '',
+    'event: put',
+    'data: {"path": "/k1", "data": null}',
+    '',
+]
+
+
+def test_iter_sse_events_parses_events():
+    events = list(iter_sse_events(SSE_LINES))
+    assert [event for event, _ in events] == ['put', 'keep-alive', 'patch', 'put', 'put']
+    assert events[1][1] == 'null'
+
+
+def test_apply_event_put_patch_and_delete():
+    listener = FirebaseStreamListener('https://example.firebaseio.com', '/sensor_logs.json', lambda entries: None)
+    # Changed entries are the live history dicts: copy each change as it is made
+    changes = [copy.deepcopy(listener.apply_event(event, json.loads(data)))
+               for event, data in iter_sse_events(SSE_LINES) if event in ('put', 'patch')]
+    assert changes[0] == {'k1': {'N': 90}, 'k2': {'N': 91}}
+    assert changes[1] == {'k2': {'N': 91, 'P': 22}}
+    assert changes[2] == {'k3': {'K': 135}}
+    assert changes[3] == {}
+    assert listener.entries == {'k2': {'N': 91, 'P': 22}, 'k3': {'K': 135}}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the Firebase REST event stream: sends SSE_LINES, then closes"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for line in SSE_LINES:
+            self.wfile.write(f'{line}\n'.encode())
+            self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def test_stream_listener_against_stand_in_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    received = []
+    done = threading.Event()
+
+    def on_entries(entries):
+        received.append(copy.deepcopy(entries))
+        if len(received) == 3:
+            done.set()
+
+    listener = FirebaseStreamListener(f'http://127.0.0.1:{server.server_address[1]}', '/sensor_logs.json',
+                                      on_entries, min_backoff=0.01, max_backoff=0.05)
+    try:
+        listener.start()
+        assert done.wait(5)
+    finally:
+        listener.stop(timeout=5)
+        server.shutdown()
+        server.server_close()
+    assert received[:3] == [{'k1': {'N': 90}, 'k2': {'N': 91}}, {'k2': {'N': 91, 'P': 22}}, {'k3': {'K': 135}}]
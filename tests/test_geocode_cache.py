@@ -0,0 +1,46 @@
+import time
+from geocode_cache import GeocodeCache
+
+
+def test_rate_limited_miss_waits_for_the_slot(tmp_path):
+    calls = []
+
+    def lookup(lat, lon):
+        calls.append((lat, lon, time.time()))
+        return f"{lat},{lon}"
+
+    cache = GeocodeCache(str(tmp_path / 'geocode.db'), lookup, min_interval=0.2, max_wait=2)
+    assert cache.get(14.6, 121.0) == '14.6,121.0'
+    assert cache.get(10.3, 123.9) == '10.3,123.9'
+    assert calls[1][2] - calls[0][2] >= 0.19
+    assert cache.stats()['rate_limited'] == 0
+
+
+def test_rate_limited_miss_gives_up_after_max_wait(tmp_path):
+    cache = GeocodeCache(str(tmp_path / 'geocode.db'), lambda lat, lon: 'Manila', min_interval=60, max_wait=0.1)
+    assert cache.get(14.6, 121.0) == 'Manila'
+    assert cache.get(10.3, 123.9) is None
+    assert cache.stats()['rate_limited'] == 1
+    # The failed miss is not cached
+    assert cache.stats()['cached'] == 1
+
+
+def test_name_stored_by_another_worker_is_reused(tmp_path):
+    path = str(tmp_path / 'geocode.db')
+    first = GeocodeCache(path, lambda lat, lon: 'Indang', min_interval=60, max_wait=0)
+    second = GeocodeCache(path, lambda lat, lon: 'unexpected', min_interval=60, max_wait=0)
+    assert first.get(14.19, 120.88) == 'Indang'
+    assert second.get(14.1904, 120.8801) == 'Indang'
+    assert second.stats()['lookups'] == 0
+
+
+def test_unresolved_location_is_served_but_not_cached(app_module, monkeypatch):
+    names = iter([None, 'Indang'])
+    monkeypatch.setattr(app_module, 'fetch_location_name', lambda lat, lon: next(names))
+    monkeypatch.setattr(app_module, 'weather_cache', app_module.WeatherCache(
+        lambda lat, lon: {'location': app_module.fetch_location_name(lat, lon)},
+        cacheable=app_module.weather_cache.cacheable))
+    assert app_module.get_weather_data(14.19, 120.88)['location'] == 'Philippines'
+    assert app_module.weather_cache.stats()['entries'] == 0
+    assert app_module.get_weather_data(14.19, 120.88)['location'] == 'Indang'
+    assert app_module.weather_cache.stats()['entries'] == 1
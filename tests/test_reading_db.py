@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from reading_db import ReadingDB
+from sensor_schema import records_to_frame
+
+
+def readings(start, count, freq='1min', **values):
+    frame = pd.DataFrame({'timestamp': pd.date_range(start, periods=count, freq=freq)})
+    for name in ('N', 'P', 'K', 'ph', 'humidity', 'temperature', 'ec'):
+        frame[name] = np.float32(values.get(name, np.nan))
+    return frame
+
+
+@pytest.fixture
+def db(tmp_path):
+    return ReadingDB(str(tmp_path / 'readings.db'))
+
+
+def write_from_other_thread(db, frame):
+    thread = threading.Thread(target=db.insert_frame, args=(frame,))
+    thread.start()
+    thread.join()
+
+
+def test_read_snapshot_ignores_concurrent_writes(db):
+    db.insert_frame(readings('2024-03-01 08:00', 3, N=90))
+    with db.read_snapshot():
+        version = db.version
+        write_from_other_thread(db, readings('2024-03-01 09:00', 2, N=95))
+        assert db.version == version
+        assert len(db.range()) == 3
+    assert db.version == version + 1
+    assert len(db.range()) == 5
+
+
+def test_history_returns_the_version_it_read(db):
+    db.insert_frame(readings('2024-03-01 08:00', 3, N=90))
+    frame, tier, version = db.history()
+    assert (len(frame), tier, version) == (3, 'raw', db.version)
+
+
+def test_device_id_is_carried_from_records(db):
+    frame = records_to_frame({
+        'k1': {'timestamp': '2024-03-01 08:00:00', 'N': 90, 'device_id': 'plot-a'},
+        'k2': {'timestamp': '2024-03-01 08:00:00', 'N': 91, 'device_id': 'plot-b'},
+        'k3': {'timestamp': '2024-03-01 08:01:00', 'N': 92},
+    })
+    assert db.insert_frame(frame, device_id='gateway') == 3
+    latest = db.latest_per_device()
+    assert dict(zip(latest['device_id'], latest['N'])) == {'gateway': 92, 'plot-a': 90, 'plot-b': 91}
+
+
+def test_backfill_version_counts_out_of_order_writes(db):
+    db.insert_frame(readings('2024-03-01 08:00', 3, N=90))
+    db.insert_frame(readings('2024-03-01 08:03', 2, N=91))
+    assert db.backfill_version == 0
+    db.insert_frame(readings('2024-03-01 08:01', 1, N=92))
+    assert db.backfill_version == 1
+    assert db.latest(10, after=pd.Timestamp('2024-03-01 08:02'))['N'].tolist() == [91, 91]
+    assert db.latest(1, after=pd.Timestamp('2024-03-01 08:04')).empty
+
+
+def test_insert_records_normalizes_firebase_entries(db):
+    records = {
+        '-k1': {'timestamp': '2024-03-01 08:00:00', 'nitrogen': 90, 'device_id': 'plot-a'},
+        '-k2': {'timestamp': '2024-03-01 08:01:00', 'N': 91},
+    }
+    assert db.insert_records(records) == 2
+    # Re-syncing the same entries replaces them instead of adding rows
+    assert db.insert_records(records) == 2
+    latest = db.latest(2)
+    assert len(db) == 2
+    assert latest['N'].tolist() == [90, 91]
+    assert latest['device_id'].tolist() == ['plot-a', 'default']
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ring_buffer import RingBuffer, SensorRingBuffers
+
+
+def test_append_wraps_around():
+    ring = RingBuffer(4)
+    for value in range(10):
+        ring.append(value)
+        expected = list(range(max(0, value - 3), value + 1))
+        assert ring.window().tolist() == expected
+    assert len(ring) == 4
+    assert ring.window(2).tolist() == [8, 9]
+    assert ring.window(10).tolist() == [6, 7, 8, 9]
+
+
+@pytest.mark.parametrize('sizes', [[3, 3, 3], [5], [11], [1, 6, 2, 9]])
+def test_extend_matches_appends(sizes):
+    extended, appended = RingBuffer(5), RingBuffer(5)
+    start = 0
+    for size in sizes:
+        values = np.arange(start, start + size)
+        extended.extend(values)
+        for value in values:
+            appended.append(value)
+        start += size
+        assert extended.window().tolist() == appended.window().tolist()
+
+
+def test_window_is_read_only():
+    ring = RingBuffer(3)
+    ring.extend([1, 2, 3])
+    with pytest.raises(ValueError):
+        ring.window()[0] = 5
+
+
+def frame(timestamps, **columns):
+    return pd.DataFrame({'timestamp': pd.to_datetime(timestamps),
+                         **{name: columns.get(name, [np.nan] * len(timestamps))
+                            for name in ('N', 'P', 'K', 'ph', 'humidity', 'temperature', 'ec')}})
+
+
+def test_sensor_rings_skip_gaps_and_old_readings():
+    rings = SensorRingBuffers(3)
+    rings.append_frame(frame(['2024-03-01 08:00', '2024-03-01 08:01'], N=[1.0, np.nan], P=[5.0, 6.0]))
+    assert rings.append_frame(frame(['2024-03-01 07:00'], N=[9.0])) == 0
+    assert rings.window('N')[1].tolist() == [1.0]
+    assert rings.window('P')[1].tolist() == [5.0, 6.0]
+    assert rings.last_timestamp() == pd.Timestamp('2024-03-01 08:01').value
+
+
+def test_sensor_windows_are_views_that_survive_later_appends():
+    rings = SensorRingBuffers(4)
+    rings.append_frame(frame(['2024-03-01 08:00', '2024-03-01 08:01'], N=[1.0, 2.0]))
+    timestamps, values = rings.window('N')
+    assert not values.flags.writeable and not values.flags.owndata
+    # capacity - n = 2 more readings leave the window untouched
+    rings.append_frame(frame(['2024-03-01 08:02', '2024-03-01 08:03'], N=[3.0, 4.0]))
+    assert values.tolist() == [1.0, 2.0]
+    assert timestamps[0] == pd.Timestamp('2024-03-01 08:00').value
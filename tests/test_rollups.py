@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+from reading_db import ReadingDB
+from rollups import HOUR, MINUTE, combine, pick_tier, rows_to_partials
+from sensor_schema import SENSOR_COLUMNS
+
+COLUMNS = ['device_id', 'timestamp'] + SENSOR_COLUMNS
+
+
+def random_rows(count, seed=0, devices=('a', 'b')):
+    rng = np.random.default_rng(seed)
+    timestamps = np.sort(rng.integers(0, 3 * HOUR, count))
+    values = rng.uniform(0, 100, (count, len(SENSOR_COLUMNS)))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    device = rng.choice(devices, count)
+    return [(device[i], int(timestamps[i]), *[None if np.isnan(v) else float(v) for v in values[i]])
+            for i in range(count)]
+
+
+def expected(rows, width):
+    """The same buckets computed the slow way with pandas groupby"""
+    frame = pd.DataFrame(rows, columns=COLUMNS).astype({name: float for name in SENSOR_COLUMNS})
+    frame['bucket'] = frame['timestamp'] - frame['timestamp'] % width
+    groups = frame.sort_values('timestamp', kind='stable').groupby(['device_id', 'bucket'])
+    result = groups.size().rename('readings').to_frame()
+    for name in SENSOR_COLUMNS:
+        result[f'{name}_min'] = groups[name].min()
+        result[f'{name}_max'] = groups[name].max()
+        result[f'{name}_sum'] = groups[name].sum()
+        result[f'{name}_count'] = groups[name].count().astype(float)
+        result[f'{name}_last'] = groups[name].last()
+    return result.reset_index()
+
+
+def as_frame(partials):
+    return pd.DataFrame({name: partials[name] for name in partials}).astype({'device_id': object})
+
+
+@pytest.mark.parametrize('width', [MINUTE, HOUR])
+def test_combine_matches_groupby(width):
+    rows = random_rows(500)
+    combined = as_frame(combine(rows_to_partials(rows, COLUMNS), width))
+    pd.testing.assert_frame_equal(combined[expected(rows, width).columns], expected(rows, width),
+                                  check_dtype=False)
+
+
+def test_hour_buckets_from_minute_buckets_match_raw():
+    rows = random_rows(500, seed=1)
+    partials = rows_to_partials(rows, COLUMNS)
+    via_minutes = as_frame(combine(combine(partials, MINUTE), HOUR))
+    direct = as_frame(combine(partials, HOUR))
+    pd.testing.assert_frame_equal(via_minutes, direct)
+
+
+def test_combine_across_devices():
+    rows = random_rows(200, seed=2)
+    merged = as_frame(combine(rows_to_partials(rows, COLUMNS), HOUR, by_device=False))
+    assert merged['readings'].sum() == 200
+    assert merged['bucket'].is_unique
+
+
+def test_pick_tier():
+    assert pick_tier(500 * MINUTE, 1000) == 'minute'
+    assert pick_tier(2000 * MINUTE, 1000) == 'hour'
+    assert pick_tier(5000 * 24 * HOUR, 1000) == 'day'
+
+
+def test_incremental_inserts_build_the_same_rollups(tmp_path):
+    frame = pd.DataFrame({'timestamp': pd.date_range('2024-03-01', periods=600, freq='37s')})
+    for i, name in enumerate(SENSOR_COLUMNS):
+        frame[name] = np.float32(np.arange(600) % (7 + i))
+    whole = ReadingDB(str(tmp_path / 'whole.db'))
+    whole.insert_frame(frame)
+    batched = ReadingDB(str(tmp_path / 'batched.db'))
+    for start in range(0, 600, 50):
+        batched.insert_frame(frame.iloc[start:start + 50])
+    for tier in ('minute', 'hour', 'day'):
+        pd.testing.assert_frame_equal(batched.rollup(tier), whole.rollup(tier))
+    hourly = whole.rollup('hour')
+    assert hourly['readings'].sum() == 600
+    assert np.allclose(hourly['N'].to_numpy(), frame.groupby(frame['timestamp'].dt.floor('h'))['N'].mean())
+
+
+def test_history_uses_rollups_for_long_windows(tmp_path):
+    db = ReadingDB(str(tmp_path / 'readings.db'))
+    frame = pd.DataFrame({'timestamp': pd.date_range('2024-03-01', periods=3000, freq='min')})
+    for name in SENSOR_COLUMNS:
+        frame[name] = np.float32(1.0)
+    db.insert_frame(frame)
+    assert db.history(max_points=5000)[1] == 'raw'
+    history, tier, _ = db.history(max_points=1000)
+    assert tier == 'hour' and len(history) == 50
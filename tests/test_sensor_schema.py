@@ -0,0 +1,45 @@
+import io
+import numpy as np
+import pandas as pd
+from sensor_schema import iter_csv_frames, parse_timestamps
+
+
+def test_parse_timestamps_mixed_offsets_convert_to_utc():
+    parsed = parse_timestamps(['2024-01-01T10:00:00+08:00', '2024-01-01T10:00:00+00:00', 'ERR', None], 'offsets')
+    assert parsed.dtype == 'datetime64[ns]'
+    assert list(parsed[:2]) == [pd.Timestamp('2024-01-01 02:00'), pd.Timestamp('2024-01-01 10:00')]
+    assert parsed[2:].isna().all()
+
+
+def test_parse_timestamps_keeps_formats_per_source():
+    # A day-first format remembered for one source must not be applied to another
+    parse_timestamps(['15/01/2024 10:00'], 'day-first')
+    parsed = parse_timestamps(['01/02/2024 10:00'], 'month-first')
+    assert parsed[0] == pd.Timestamp('2024-01-02 10:00')
+    assert parse_timestamps(['01/02/2024 10:00'], 'day-first')[0] == pd.Timestamp('2024-02-01 10:00')
+
+
+def test_parse_timestamps_passes_datetimes_through():
+    values = pd.Series(pd.to_datetime(['2024-01-01T10:00:00+08:00']))
+    assert parse_timestamps(values)[0] == np.datetime64('2024-01-01T02:00:00')
+
+
+SHEET_CSV = (b"Timestamp,N (ppm),P (ppm),K (ppm),pH,Humidity,Notes\n"
+             b"2024-03-01 08:00:00,95,22,135,6.8,72,ok\n"
+             b"2024-03-01 08:05:00,ERR,nan ,130, ,71,\n"
+             b"2024-03-01 08:10:00,97,23,136,6.9,73,\n")
+
+
+def test_iter_csv_frames_coerces_bad_cells():
+    frames = list(iter_csv_frames(io.BytesIO(SHEET_CSV), chunksize=2))
+    frame = pd.concat(frames, ignore_index=True)
+    assert len(frame) == 3
+    assert frame['N'].dtype == np.float32
+    assert np.isnan(frame['N'][1]) and np.isnan(frame['P'][1]) and np.isnan(frame['ph'][1])
+    assert frame['K'].tolist() == [135, 130, 136]
+    assert 'Notes' not in frame.columns
+
+
+def test_iter_csv_frames_skips_chunks_not_after():
+    frames = list(iter_csv_frames(io.BytesIO(SHEET_CSV), chunksize=2, after=np.datetime64('2024-03-01T08:05:00')))
+    assert sum(len(frame) for frame in frames) == 1
@@ -0,0 +1,67 @@
+import re
+import pandas as pd
+from sheet_tail import SheetTailReader, column_letter
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSheet:
+    """Answers the gviz queries SheetTailReader sends from a list of rows"""
+
+    def __init__(self, header, rows):
+        self.header = header
+        self.rows = rows
+        self.queries = []
+
+    def csv(self, rows):
+        return pd.DataFrame(rows, columns=self.header).to_csv(index=False).encode()
+
+    def get(self, url, params=None):
+        query = params['tq']
+        self.queries.append(query)
+        if query == 'select * limit 1':
+            return FakeResponse(self.csv(self.rows[:1]))
+        count = re.fullmatch(r'select count\((\w+)\)', query)
+        if count:
+            column = [column_letter(i) for i in range(len(self.header))].index(count.group(1))
+            filled = sum(1 for row in self.rows if row[column] != '')
+            return FakeResponse(f'count\n{filled}\n'.encode())
+        offset = int(re.fullmatch(r'select \* offset (\d+)', query).group(1))
+        rows = self.rows[offset:]
+        return FakeResponse(self.csv(rows) if rows else b'')
+
+
+def test_column_letters():
+    assert [column_letter(i) for i in (0, 1, 25, 26, 27, 701, 702)] == ['A', 'B', 'Z', 'AA', 'AB', 'ZZ', 'AAA']
+
+
+def test_counts_the_timestamp_column_and_reads_only_new_rows():
+    # Column A (notes) is mostly blank; the timestamp column is always filled
+    sheet = FakeSheet(['Notes', 'Timestamp', 'N (ppm)'],
+                      [['', '2024-03-01 08:00', 90], ['', '2024-03-01 08:01', 91], ['x', '2024-03-01 08:02', 92]])
+    reader = SheetTailReader('sheet', client=sheet)
+    assert reader.latest_row()['N (ppm)'] == 92
+    assert 'select count(B)' in sheet.queries
+    assert reader.rows_seen == 3
+    sheet.rows.append(['', '2024-03-01 08:03', 93])
+    assert reader.latest_row()['N (ppm)'] == 93
+    assert sheet.queries[-1] == 'select * offset 3'
+
+
+def test_recounts_after_rows_are_deleted():
+    sheet = FakeSheet(['Timestamp', 'N (ppm)'], [[f'2024-03-01 08:0{i}', 90 + i] for i in range(4)])
+    reader = SheetTailReader('sheet', client=sheet)
+    assert reader.latest_row()['N (ppm)'] == 93
+    # Nothing new and nothing deleted: the last row is kept
+    assert reader.latest_row()['N (ppm)'] == 93
+    del sheet.rows[2:]
+    assert reader.latest_row()['N (ppm)'] == 91
+    assert reader.rows_seen == 2
+    sheet.rows.clear()
+    assert reader.latest_row() is None
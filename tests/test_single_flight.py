@@ -0,0 +1,55 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'value': 42}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flight.do, 'latest', fetch)
+        assert started.wait(5)
+        followers = [pool.submit(flight.do, 'latest', fetch) for _ in range(4)]
+        # Followers are waiting on the leader before it finishes
+        while flight.stats()['latest']['calls'] < 5:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result(5)] + [future.result(5) for future in followers]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats()['latest'] == {'calls': 5, 'executions': 1, 'coalesced': 4}
+
+
+def test_exception_is_shared_and_next_call_runs_again():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('upstream down')
+
+    with pytest.raises(ValueError):
+        flight.do('latest', fail)
+    assert flight.do('latest', lambda: 'ok') == 'ok'
+    assert flight.stats()['latest']['executions'] == 2
+
+
+def test_keys_do_not_coalesce_across_each_other():
+    flight = SingleFlight()
+
+    @flight.coalesce('a')
+    def first():
+        return flight.do('b', lambda: 'b')
+
+    assert first() == 'b'
+    assert flight.stats() == {'a': {'calls': 1, 'executions': 1, 'coalesced': 0},
+                              'b': {'calls': 1, 'executions': 1, 'coalesced': 0}}
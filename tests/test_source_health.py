@@ -0,0 +1,115 @@
+import pytest
+import source_health
+from source_health import CLOSED, HALF_OPEN, OPEN, SourceSelector
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(source_health.time, 'time', clock)
+    return clock
+
+
+def state(selector, name):
+    return selector.stats()[name]['state']
+
+
+def test_circuit_opens_after_failure_threshold(clock):
+    selector = SourceSelector(['a'], failure_threshold=3, cooldown=30)
+    for _ in range(2):
+        selector.record('a', False)
+    assert state(selector, 'a') == CLOSED and selector.allow('a')
+    selector.record('a', False)
+    assert state(selector, 'a') == OPEN
+    assert not selector.allow('a')
+
+
+def test_one_half_open_trial_after_cooldown(clock):
+    selector = SourceSelector(['a'], failure_threshold=1, cooldown=30)
+    selector.record('a', False)
+    clock.now += 29
+    assert not selector.allow('a')
+    clock.now += 1
+    assert selector.allow('a')
+    assert state(selector, 'a') == HALF_OPEN
+    # The trial is in flight: nothing else gets through
+    assert not selector.allow('a')
+
+
+def test_half_open_success_closes_and_failure_reopens(clock):
+    selector = SourceSelector(['a', 'b'], failure_threshold=3, cooldown=30)
+    for name in ('a', 'b'):
+        for _ in range(3):
+            selector.record(name, False)
+    clock.now += 30
+    assert selector.allow('a') and selector.allow('b')
+    selector.record('a', True)
+    assert state(selector, 'a') == CLOSED and selector.allow('a')
+    # One failed trial re-opens the circuit, below the failure threshold, for another cooldown
+    selector.record('b', False)
+    assert state(selector, 'b') == OPEN
+    assert not selector.allow('b')
+    clock.now += 30
+    assert selector.allow('b')
+
+
+def test_order_prefers_fast_sources_and_skips_open_ones(clock):
+    selector = SourceSelector(['slow', 'fast', 'down'], failure_threshold=1, probe_interval=60)
+    selector.record('slow', True, latency=0.8)
+    selector.record('fast', True, latency=0.1)
+    selector.record('down', False, latency=0.01)
+    assert selector.order() == ['fast', 'slow', 'down']
+    # Latency is an EWMA, so one slow call does not demote a fast source
+    selector.record('fast', True, latency=1.0)
+    assert selector.order()[0] == 'fast'
+    for _ in range(4):
+        selector.record('fast', True, latency=1.0)
+    assert selector.order() == ['slow', 'fast', 'down']
+
+
+def test_idle_source_is_probed_first(clock):
+    selector = SourceSelector(['slow', 'fast'], probe_interval=60)
+    selector.record('slow', True, latency=0.8)
+    selector.record('fast', True, latency=0.1)
+    clock.now += 50
+    selector.record('fast', True, latency=0.1)
+    clock.now += 20
+    assert selector.order() == ['slow', 'fast']
+    selector.record('slow', True, latency=0.8)
+    assert selector.order() == ['fast', 'slow']
+
+
+def test_fetch_latest_uses_fastest_healthy_source(app_module, monkeypatch, clock):
+    selector = SourceSelector(['sheets', 'firebase'], failure_threshold=1)
+    calls = []
+
+    def source(name, result):
+        def fetch():
+            calls.append(name)
+            return result
+        return fetch
+
+    monkeypatch.setattr(app_module, 'source_selector', selector)
+    monkeypatch.setattr(app_module, 'LATEST_SOURCES', {
+        'sheets': source('sheets', ({'N': 1.0}, 'sheet-ts')),
+        'firebase': source('firebase', ({'N': 2.0}, 'firebase-ts')),
+    })
+    selector.record('sheets', True, latency=0.9)
+    selector.record('firebase', True, latency=0.2)
+    assert app_module.fetch_latest_data() == ({'N': 2.0}, 'firebase-ts')
+    assert calls == ['firebase']
+    # A falsy result counts as a failure; with the circuit open the next read goes to the other source
+    app_module.LATEST_SOURCES['firebase'] = source('firebase', None)
+    assert app_module.fetch_latest_data() == ({'N': 1.0}, 'sheet-ts')
+    assert state(selector, 'firebase') == OPEN
+    calls.clear()
+    assert app_module.fetch_latest_data() == ({'N': 1.0}, 'sheet-ts')
+    assert calls == ['sheets']
@@ -0,0 +1,91 @@
+import threading
+import time
+from stale_cache import StaleWhileRevalidateCache
+
+
+def test_first_call_waits_then_serves_cached_value():
+    values = iter([1, 2])
+    cache = StaleWhileRevalidateCache(lambda: next(values), ttl=60, max_stale=600)
+    value, age = cache.get()
+    assert value == 1 and age < 1
+    assert cache.get()[0] == 1
+
+
+def test_expired_value_is_served_while_one_refresh_runs():
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return len(calls)
+
+    cache = StaleWhileRevalidateCache(fetch, ttl=60, max_stale=600)
+    assert cache.get()[0] == 1
+    cache._fetched_at -= 120
+    # Both calls return the stale value at once; only one refresh starts
+    assert cache.get()[0] == 1
+    assert cache.get()[0] == 1
+    release.set()
+    deadline = time.time() + 5
+    while cache.get()[0] != 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.get()[0] == 2
+    assert len(calls) == 2
+
+
+def test_synchronous_refresh_does_not_allow_a_second_background_refresh():
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(threading.current_thread().name)
+        if len(calls) == 2:
+            started.set()
+            release.wait(5)
+        return len(calls)
+
+    cache = StaleWhileRevalidateCache(fetch, ttl=60, max_stale=600)
+    assert cache.get()[0] == 1
+    cache.refresh_async()
+    assert started.wait(5)
+    # A synchronous refresh while the background one runs must not clear its flag
+    assert cache.refresh() is True
+    cache.refresh_async()
+    assert calls.count('cache-refresh') == 1
+    release.set()
+    deadline = time.time() + 5
+    while cache._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+    cache.refresh_async()
+    deadline = time.time() + 5
+    while calls.count('cache-refresh') < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert calls.count('cache-refresh') == 2
+
+
+def test_failed_refresh_keeps_last_good_value_until_max_stale():
+    values = iter([{'N': 1}, None, RuntimeError('down')])
+
+    def fetch():
+        value = next(values)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    cache = StaleWhileRevalidateCache(fetch, ttl=60, max_stale=600)
+    assert cache.get()[0] == {'N': 1}
+    assert cache.refresh() is False
+    assert cache.refresh() is False
+    assert cache.get()[0] == {'N': 1}
+    assert cache.stats()['failures'] == 2
+    cache._fetched_at -= 700
+    assert cache.get()[0] is None
+
+
+def test_nothing_usable_after_max_stale():
+    cache = StaleWhileRevalidateCache(lambda: {}, ttl=0, max_stale=0, valid=lambda value: bool(value))
+    value, age = cache.get()
+    assert value is None and age is None
@@ -0,0 +1,61 @@
+import io
+from sensor_schema import iter_csv_frames
+from upstream_client import ConditionalResource
+
+CSV = b"Timestamp,N (ppm)\n2024-03-01 08:00:00,95\n2024-03-01 08:05:00,96\n"
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.raw = io.BytesIO(body)
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.sent.append(headers)
+        return self.responses.pop(0)
+
+
+def test_open_skips_unchanged_content():
+    changed = CSV + b"2024-03-01 08:10:00,97\n"
+    client = FakeClient(FakeResponse(200, CSV), FakeResponse(200, CSV), FakeResponse(200, changed))
+    source = ConditionalResource('https://sheet.example/export', client=client)
+    download = source.open()
+    with download.body:
+        assert sum(len(frame) for frame in iter_csv_frames(download.body, chunksize=1)) == 2
+    source.commit(download)
+    assert source.open() is None
+    assert source.stats()['unchanged'] == 1
+    assert source.open().body.read().endswith(b"97\n")
+
+
+def test_open_sends_validators_and_honours_304():
+    client = FakeClient(FakeResponse(200, CSV, {'ETag': '"v1"'}), FakeResponse(304))
+    source = ConditionalResource('https://sheet.example/export', client=client)
+    source.commit(source.open())
+    assert source.open() is None
+    assert client.sent[1] == {'If-None-Match': '"v1"'}
+    assert source.stats()['not_modified'] == 1
+
+
+def test_uncommitted_download_is_offered_again():
+    client = FakeClient(FakeResponse(200, CSV), FakeResponse(200, CSV))
+    source = ConditionalResource('https://sheet.example/export', client=client)
+    assert source.open() is not None
+    # Ingest failed before commit: the same content must be parsed again
+    assert source.open() is not None
@@ -0,0 +1,39 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from weather_cache import WeatherCache
+
+
+def test_nearby_coordinates_share_an_entry():
+    calls = []
+
+    def fetch(lat, lon):
+        calls.append((lat, lon))
+        return {'lat': lat, 'lon': lon}
+
+    cache = WeatherCache(fetch, grid=0.01)
+    first = cache.get(14.6001, 121.0004)
+    assert cache.get(14.5996, 120.9999) is first
+    assert calls == [(14.6, 121.0)]
+    assert cache.stats()['hits'] == 1
+
+
+def test_failures_are_not_cached():
+    results = iter([None, {'ok': True}])
+    cache = WeatherCache(lambda lat, lon: next(results))
+    assert cache.get(14.6, 121.0) is None
+    assert cache.get(14.6, 121.0) == {'ok': True}
+    assert cache.stats()['entries'] == 1
+
+
+def test_refreshes_do_not_starve_the_pool_fetch_waits_on():
+    # fetch() hands part of its work to a small shared pool and waits on it,
+    # as fetch_weather does with the geocode lookup on upstream_pool
+    shared = ThreadPoolExecutor(max_workers=1)
+    cache = WeatherCache(lambda lat, lon: shared.submit(lambda: (lat, lon)).result(timeout=5), refresh_workers=1)
+    for i in range(8):
+        cache.prefetch(14 + i, 121)
+    done = threading.Event()
+    shared.submit(done.set)
+    assert done.wait(5)
+    wait([cache.executor.submit(lambda: None)], timeout=5)
+    assert cache.stats()['entries'] == 8
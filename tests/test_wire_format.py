@@ -0,0 +1,60 @@
+import struct
+import numpy as np
+import pandas as pd
+import pytest
+import wire_format
+from sensor_schema import SENSOR_COLUMNS
+
+
+@pytest.fixture
+def frame():
+    frame = pd.DataFrame({'timestamp': [pd.Timestamp('2024-03-01 08:00:00.125'), pd.Timestamp('2024-03-01 08:05:00')]})
+    for i, name in enumerate(SENSOR_COLUMNS):
+        frame[name] = np.array([i + 0.5, np.nan], dtype=np.float32)
+    return frame
+
+
+def test_round_trip(frame):
+    body = wire_format.encode(frame)
+    assert len(body) == wire_format.HEADER.size + 2 * wire_format.RECORD.itemsize + wire_format.TRAILER.size
+    pd.testing.assert_frame_equal(wire_format.decode_frame(body), frame)
+
+
+def test_missing_sensors_are_sent_as_nan(frame):
+    decoded = wire_format.decode_frame(wire_format.encode(frame.drop(columns=['ec', 'temperature'])))
+    assert decoded['ec'].isna().all() and decoded['temperature'].isna().all()
+    assert decoded['N'][0] == 0.5
+
+
+def test_empty_batch(frame):
+    assert wire_format.decode_frame(wire_format.encode(frame.iloc[:0])).empty
+
+
+@pytest.mark.parametrize('cut', [1, wire_format.TRAILER.size, wire_format.RECORD.itemsize])
+def test_truncated_batch(frame, cut):
+    with pytest.raises(ValueError):
+        wire_format.decode(wire_format.encode(frame)[:-cut])
+
+
+def test_too_short_for_a_header():
+    with pytest.raises(ValueError, match='too short'):
+        wire_format.decode(b'HFRB')
+
+
+def test_wrong_version(frame):
+    body = bytearray(wire_format.encode(frame))
+    struct.pack_into('<H', body, 4, wire_format.VERSION + 1)
+    with pytest.raises(ValueError, match='unsupported batch version'):
+        wire_format.decode(bytes(body))
+
+
+def test_wrong_magic(frame):
+    with pytest.raises(ValueError, match='not a Hapag reading batch'):
+        wire_format.decode(b'XXXX' + wire_format.encode(frame)[4:])
+
+
+def test_corrupted_record(frame):
+    body = bytearray(wire_format.encode(frame))
+    body[wire_format.HEADER.size + 9] ^= 0xFF
+    with pytest.raises(ValueError, match='checksum'):
+        wire_format.decode(bytes(body))
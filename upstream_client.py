@@ -0,0 +1,216 @@
+# Hapag Farm - Pooled Upstream HTTP Client
+import hashlib
+import random
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (5, 10)  # (connect, read) seconds
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Bytes read per step when a streamed body is copied to disk
+DOWNLOAD_CHUNK = 2**16
+
+# A streamed body (a temporary file) with the validators and digest it was served with
+Download = namedtuple('Download', ['body', 'etag', 'last_modified', 'digest'])
+
+
+class UpstreamClient:
+    """
+    Shared HTTP client for Sheets, Firebase, open-meteo and Nominatim.
+
+    Keeps one keep-alive requests.Session per host, applies per-host
+    (connect, read) timeouts and retries transient failures a bounded number
+    of times with full-jitter exponential backoff.
+    """
+
+    def __init__(self, retries=2, backoff=0.3, pool_size=10, user_agent='HapagFarm/1.0'):
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.user_agent = user_agent
+        self._timeouts = {}
+        self._sessions = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def configure_host(self, host, connect=None, read=None):
+        """Override the (connect, read) timeout for one host"""
+        default_connect, default_read = self._timeouts.get(host, DEFAULT_TIMEOUT)
+        self._timeouts[host] = (connect or default_connect, read or default_read)
+
+    def _session(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = self.user_agent
+                self._sessions[host] = session
+                self._counters[host] = {'retries': 0, 'errors': 0}
+            return session
+
+    def _count(self, host, name):
+        with self._lock:
+            self._counters[host][name] += 1
+
+    def request(self, method, url, timeout=None, retries=None, **kwargs):
+        host = urlsplit(url).netloc
+        session = self._session(host)
+        timeout = timeout or self._timeouts.get(host, DEFAULT_TIMEOUT)
+        retries = self.retries if retries is None else retries
+
+        for attempt in range(retries + 1):
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    self._count(host, 'errors')
+                    raise
+            self._count(host, 'retries')
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def stats(self):
+        """Per-host request, connection and reuse counters"""
+        stats = {}
+        with self._lock:
+            sessions = dict(self._sessions)
+            counters = {host: dict(values) for host, values in self._counters.items()}
+        for host, session in sessions.items():
+            requests_sent = connections = 0
+            pools = session.get_adapter(f"https://{host}").poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    requests_sent += pool.num_requests
+                    connections += pool.num_connections
+            stats[host] = dict(counters.get(host, {}), requests=requests_sent,
+                               connections_opened=connections,
+                               connections_reused=max(requests_sent - connections, 0))
+        return stats
+
+
+class ConditionalResource:
+    """
+    A remote document fetched with conditional requests.
+
+    The ETag / Last-Modified validators of the last 200 response are sent back
+    as If-None-Match / If-Modified-Since. When the server answers 304, or the
+    body hashes to the same digest as before, the resource is unchanged and
+    results cached with parsed() are reused without re-parsing.
+    """
+
+    def __init__(self, url, client=None):
+        self.url = url
+        self.client = client or upstream
+        self.content = None
+        self.digest = None
+        self.etag = None
+        self.last_modified = None
+        self.not_modified = 0
+        self.unchanged = 0
+        self._parsed = {}
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        """Refresh from upstream; returns True if the content changed"""
+        headers = {}
+        if self.content is not None:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+        response = self.client.get(self.url, headers=headers)
+        if response.status_code == 304:
+            self.not_modified += 1
+            return False
+        response.raise_for_status()
+        digest = hashlib.sha256(response.content).hexdigest()
+        with self._lock:
+            self.etag = response.headers.get('ETag')
+            self.last_modified = response.headers.get('Last-Modified')
+            if digest == self.digest:
+                self.unchanged += 1
+                return False
+            self.content = response.content
+            self.digest = digest
+            self._parsed = {}
+            return True
+
+    def open(self, spool_size=8 * 2**20):
+        """
+        Streaming conditional GET for callers that parse the body
+        incrementally. The body is hashed while it is copied to a temporary
+        file (held in memory up to spool_size bytes), so memory stays bounded
+        and an unchanged export is never parsed. Returns a Download whose body
+        is positioned at the start, or None when the server answers 304 or
+        the body hashes the same as the last committed one. Call
+        commit(download) once the body has been fully processed so its
+        validators and digest are used for the next request.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        with self.client.get(self.url, headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                self.not_modified += 1
+                return None
+            response.raise_for_status()
+            response.raw.decode_content = True
+            body = tempfile.SpooledTemporaryFile(max_size=spool_size)
+            digest = hashlib.sha256()
+            try:
+                for chunk in iter(lambda: response.raw.read(DOWNLOAD_CHUNK), b''):
+                    digest.update(chunk)
+                    body.write(chunk)
+            except Exception:
+                body.close()
+                raise
+            download = Download(body, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                                digest.hexdigest())
+        if download.digest == self.digest:
+            body.close()
+            self.unchanged += 1
+            self.commit(download)
+            return None
+        body.seek(0)
+        return download
+
+    def commit(self, download):
+        with self._lock:
+            self.etag = download.etag
+            self.last_modified = download.last_modified
+            self.digest = download.digest
+
+    def parsed(self, name, parse):
+        """parse(content), computed once per content digest"""
+        with self._lock:
+            digest, content = self.digest, self.content
+            cached = self._parsed.get(name)
+        if cached and cached[0] == digest:
+            return cached[1]
+        value = parse(content)
+        with self._lock:
+            if self.digest == digest:
+                self._parsed[name] = (digest, value)
+        return value
+
+    def stats(self):
+        return {'digest': self.digest, 'not_modified': self.not_modified, 'unchanged': self.unchanged}
+
+
+# Process-wide client shared by the app and the ingestion modules
+upstream = UpstreamClient()
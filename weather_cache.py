@@ -0,0 +1,102 @@
+# Hapag Farm - Weather Cache
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from single_flight import SingleFlight
+
+
+class WeatherCache:
+    """
+    LRU cache of weather results keyed by coordinates rounded to a grid
+    (grid degrees; 0.01 is about 1 km), so nearby requests share one entry.
+
+    Entries expire at the next period boundary (open-meteo data is hourly),
+    not a fixed time after they were fetched. Within refresh_ahead seconds
+    of expiry an access starts a background refresh, and an expired entry is
+    still served for up to max_stale seconds while it refreshes, so callers
+    only wait on fetch() for coordinates they have never asked for.
+    Concurrent misses for one cell share a single fetch.
+    fetch(lat, lon) returns None on failure; failures, and values for which
+    cacheable(value) is false, are returned but not cached.
+
+    Background refreshes run on the cache's own executor (refresh_workers
+    threads), never on a pool that fetch() itself submits work to and waits
+    on, which would deadlock once every worker is a waiting refresh.
+    """
+
+    def __init__(self, fetch, grid=0.01, period=3600, refresh_ahead=300, max_stale=3600, max_entries=256,
+                 refresh_workers=2, cacheable=None):
+        self.fetch = fetch
+        self.cacheable = cacheable
+        self.executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='weather-refresh')
+        self.grid = grid
+        self.period = period
+        self.refresh_ahead = refresh_ahead
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, fetched_at, expires_at)
+        self._refreshing = set()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def key(self, lat, lon):
+        return (round(round(float(lat) / self.grid) * self.grid, 6),
+                round(round(float(lon) / self.grid) * self.grid, 6))
+
+    def expires_at(self, now):
+        return (now // self.period + 1) * self.period
+
+    def get(self, lat, lon):
+        """Weather for the grid cell containing (lat, lon), or None if it cannot be fetched"""
+        key = self.key(lat, lon)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            value, fetched_at, expires_at = entry
+            if now < expires_at + self.max_stale:
+                self.hits += 1
+                # Refresh once per period: entries fetched inside the refresh window wait for expiry
+                refresh_from = expires_at - self.refresh_ahead
+                if now >= expires_at or (now >= refresh_from and fetched_at < refresh_from):
+                    self.prefetch(*key)
+                return value
+        self.misses += 1
+        return self._flight.do(key, self.refresh, key)
+
+    def refresh(self, key):
+        try:
+            value = self.fetch(*key)
+        except Exception as e:
+            print(f"Weather cache refresh error: {e}")
+            value = None
+        with self._lock:
+            self._refreshing.discard(key)
+            if value is not None and (self.cacheable is None or self.cacheable(value)):
+                now = time.time()
+                self._entries[key] = (value, now, self.expires_at(now))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def prefetch(self, lat, lon):
+        """Refresh a cell in the background (at most one refresh per cell at a time)"""
+        key = self.key(lat, lon)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self.refreshes += 1
+        self.executor.submit(self.refresh, key)
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses, 'refreshes': self.refreshes}
@@ -0,0 +1,69 @@
+# Hapag Farm - Binary Reading Wire Format
+import struct
+import zlib
+import numpy as np
+import pandas as pd
+
+CONTENT_TYPE = 'application/x-hapag-readings'
+MAGIC = b'HFRB'
+VERSION = 1
+
+# Batch header: magic, format version, record size in bytes, record count
+HEADER = struct.Struct('<4sHHI')
+# Trailer: CRC32 of header + records
+TRAILER = struct.Struct('<I')
+
+# Fixed record layout, little-endian; timestamp in milliseconds since the Unix
+# epoch (wall-clock time, read like the naive timestamps of the other sources)
+RECORD = np.dtype([
+    ('timestamp', '<i8'),
+    ('N', '<f4'),
+    ('P', '<f4'),
+    ('K', '<f4'),
+    ('ph', '<f4'),
+    ('humidity', '<f4'),
+    ('temperature', '<f4'),
+    ('ec', '<f4'),
+])
+
+
+def encode(frame):
+    """Pack a normalized history frame (missing sensors are sent as NaN) into one batch"""
+    records = np.zeros(len(frame), dtype=RECORD)
+    records['timestamp'] = frame['timestamp'].to_numpy(dtype='datetime64[ms]').view(np.int64)
+    for name in RECORD.names[1:]:
+        records[name] = frame[name].to_numpy(dtype=np.float32) if name in frame.columns else np.nan
+    header = HEADER.pack(MAGIC, VERSION, RECORD.itemsize, len(records))
+    body = header + records.tobytes()
+    return body + TRAILER.pack(zlib.crc32(body))
+
+
+def decode(buffer):
+    """
+    Validate a batch and return its records as a structured numpy array that
+    views the buffer directly (no copy). Raises ValueError on a malformed batch.
+    """
+    buffer = memoryview(buffer)
+    if len(buffer) < HEADER.size + TRAILER.size:
+        raise ValueError("batch too short")
+    magic, version, record_size, count = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("not a Hapag reading batch")
+    if version != VERSION or record_size != RECORD.itemsize:
+        raise ValueError(f"unsupported batch version {version} (record size {record_size})")
+    end = HEADER.size + count * RECORD.itemsize
+    if len(buffer) != end + TRAILER.size:
+        raise ValueError(f"batch length does not match {count} records")
+    (checksum,) = TRAILER.unpack_from(buffer, end)
+    if zlib.crc32(buffer[:end]) != checksum:
+        raise ValueError("batch checksum mismatch")
+    return np.frombuffer(buffer, dtype=RECORD, count=count, offset=HEADER.size)
+
+
+def decode_frame(buffer):
+    """Decode a batch into a normalized history frame sorted by timestamp"""
+    records = decode(buffer)
+    frame = pd.DataFrame({'timestamp': records['timestamp'].astype('datetime64[ms]').astype('datetime64[ns]')})
+    for name in RECORD.names[1:]:
+        frame[name] = records[name]
+    return frame.sort_values('timestamp', kind='stable').reset_index(drop=True)